@@ -0,0 +1,255 @@
+"""
+Benchmark suite for blatt: times the stages of Page on synthetic PAGE XML files and the throughput of the CLI, records
+peak memory and compares the results with a stored baseline.
+
+    python benchmarks/run.py --save-baseline benchmarks/baseline.json
+    python benchmarks/run.py --baseline benchmarks/baseline.json
+
+See benchmarks/README.md for the options.
+"""
+from pathlib import Path
+from typing import Callable, Dict
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+import tracemalloc
+
+import click
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from blatt import Page  # noqa: E402
+from blatt.pack import PackedCorpus, pack  # noqa: E402
+from blatt.sentences import get_splitter  # noqa: E402
+from blatt.layout import merge_segments, page_layout  # noqa: E402
+from blatt.spatial import LineIndex  # noqa: E402
+from synthetic import synthetic_lines, synthetic_page_xml, write_synthetic_folder  # noqa: E402
+
+CONTEXT_SETTINGS = dict(help_option_names=['-h', '--help'])
+
+
+def measure(function: Callable, repeat: int) -> Dict:
+    """Returns the median and minimum wall time of function over repeat runs and the peak of Python memory
+    allocations (tracemalloc) of one extra run."""
+    times = timeit.Timer(function).repeat(repeat=repeat, number=1)
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {'seconds': statistics.median(times), 'min_seconds': min(times), 'peak_kib': peak // 1024}
+
+
+def page_benchmarks(page_file: Path, workdir: Path, lines: int, repeat: int) -> Dict[str, Dict]:
+    """Benchmarks the stages of Page on page_file."""
+    results = {}
+    tree_page = Page(page_file)
+    stream_page = Page(page_file, streaming=True)
+    text = stream_page.text_without_linebreaks
+    hyphenated = synthetic_lines(lines)
+
+    def fresh(page: Page) -> Page:
+        for attribute in ('text_with_linebreaks', 'text_without_linebreaks', 'sentences', 'text_regions',
+                          'x_baselines', 'y_baselines', 'center_baseline'):
+            page.__dict__.pop(attribute, None)
+        return page
+
+    results['Page.__init__'] = measure(lambda: Page(page_file), repeat)
+    results['Page.__init__(streaming)'] = measure(lambda: Page(page_file, streaming=True), repeat)
+    results['_parse_page_xml'] = measure(lambda: tree_page._parse_page_xml(tree_page._iter_page_xml()), repeat)
+    results['_parse_page_xml(streaming)'] = measure(
+        lambda: stream_page._parse_page_xml(stream_page._iterparse_page_xml(page_file)), repeat)
+    results['remove_hyphens(page)'] = measure(lambda: Page.remove_hyphens(stream_page.text_lines), repeat)
+    results['remove_hyphens(%d lines)' % lines] = measure(lambda: Page.remove_hyphens(hyphenated), repeat)
+    results['split_sentences'] = measure(lambda: Page.split_sentences(text), repeat)
+    results['split_sentences(rules)'] = measure(lambda: get_splitter('rules').split(text), repeat)
+    results['_compute_baselines'] = measure(stream_page._compute_baselines, repeat)
+    results['text_regions'] = measure(lambda: fresh(stream_page).text_regions, repeat)
+    results['spatial_index'] = measure(lambda: LineIndex(stream_page.baseline_bboxes), repeat)
+    results['page_layout'] = measure(lambda: page_layout(stream_page), repeat)
+    layout = page_layout(stream_page)
+    segments = [[(stream_page.text_lines[i], '', dy) for i, dy in zip(layout['order'][s['start']:s['stop']],
+                                                                       layout['dy0'][s['start']:s['stop']])]
+                for s in layout['segments']]
+    book = [(f'{page}_{i}', lines, i == 0) for page in range(1000) for i, lines in enumerate(segments)]
+    results['merge_segments(1000 pages)'] = measure(lambda: merge_segments(book, 59), repeat)
+    index = stream_page.spatial_index
+    results['spatial_index queries'] = measure(
+        lambda: [index.band(y, y + 100) for y in range(0, 3600, 10)] + [index.below(i) for i in range(len(index))],
+        repeat)
+    stream_page.sentences
+    results['to_txt'] = measure(lambda: stream_page.to_txt(workdir / 'out.txt'), repeat)
+    results['to_txt(linebreak)'] = measure(lambda: stream_page.to_txt(workdir / 'out.txt', linebreak=True), repeat)
+    results['to_tsv'] = measure(lambda: stream_page.to_tsv(workdir / 'out.tsv'), repeat)
+    results['to_tsv(sentence)'] = measure(lambda: stream_page.to_tsv(workdir / 'out.tsv', sentence=True), repeat)
+    results['Page + to_tsv(sentence)'] = measure(
+        lambda: Page(page_file, streaming=True).to_tsv(workdir / 'out.tsv', sentence=True), repeat)
+    pack([page_file], workdir / 'page.blatt')
+
+    def packed_open():
+        with PackedCorpus(workdir / 'page.blatt') as corpus:
+            return corpus
+
+    def packed_page():
+        with PackedCorpus(workdir / 'page.blatt') as corpus:
+            return corpus.page(0)
+
+    results['PackedCorpus open'] = measure(packed_open, repeat)
+    results['PackedCorpus page'] = measure(packed_page, repeat)
+    return results
+
+
+# Runs a module (-m MODULE ARGS...) or code (-c CODE) and reports the peak resident memory of the process and its
+# workers at exit. The rusage of the benchmark process cannot be used, as Linux keeps the peak of the forked parent
+# across exec.
+PROBE = """
+import atexit, resource, runpy, sys
+def report():
+    with open('/proc/self/status') as f:
+        peak = max([int(line.split()[1]) for line in f if line.startswith('VmHWM')] or [0])
+    peak = max(peak, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    sys.__stderr__.write('\\nBLATT_PEAK_KIB=%d\\n' % peak)
+atexit.register(report)
+mode, target = sys.argv[1:3]
+sys.argv = [target] + sys.argv[3:]
+if mode == '-m':
+    runpy.run_module(target, run_name='__main__', alter_sys=True)
+else:
+    exec(compile(target, '<string>', 'exec'), {'__name__': '__main__'})
+"""
+
+
+def run_subprocess(args: list) -> Dict:
+    """Runs python with args ('-m', MODULE, ARGS... or '-c', CODE) and returns its wall time in seconds and the peak
+    resident memory in KiB of the process and its workers."""
+    command = [sys.executable, '-c', PROBE] + args
+    start = time.perf_counter()
+    process = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+                             cwd=Path(__file__).resolve().parent.parent)
+    seconds = time.perf_counter() - start
+    if process.returncode:
+        raise click.ClickException('%s failed with exit code %d.' % (' '.join(args), process.returncode))
+    peaks = [int(line.split('=')[1]) for line in process.stderr.splitlines() if line.startswith('BLATT_PEAK_KIB=')]
+    return {'seconds': seconds, 'peak_kib': peaks[-1] if peaks else 0}
+
+
+def startup_benchmarks(repeat: int) -> Dict[str, Dict]:
+    """Benchmarks the cold-start latency of the CLI and of importing blatt in fresh interpreters. 'python startup' is
+    the interpreter itself, for reference."""
+    commands = {
+        'python startup': ['-c', 'pass'],
+        'startup import blatt': ['-c', 'import blatt'],
+        'startup import blatt.Page': ['-c', 'from blatt import Page'],
+        'startup blatt -h': ['-m', 'blatt.cli', '-h'],
+        'startup blatt to_txt -h': ['-m', 'blatt.cli', 'to_txt', '-h'],
+    }
+    results = {}
+    for name, args in commands.items():
+        runs = [run_subprocess(args) for _ in range(repeat)]
+        times = [run['seconds'] for run in runs]
+        results[name] = {'seconds': statistics.median(times), 'min_seconds': min(times),
+                         'peak_kib': max(run['peak_kib'] for run in runs)}
+    return results
+
+
+def cli_benchmarks(page_folder: Path, workdir: Path, pages: int, jobs: int, repeat: int) -> Dict[str, Dict]:
+    """Benchmarks the throughput (pages/sec) and the peak memory of the CLI commands in subprocesses."""
+    commands = {
+        'cli to_txt': ['to_txt', '-j', str(jobs)],
+        'cli to_tsv': ['to_tsv', '-j', str(jobs)],
+        'cli to_tsv(sentence)': ['to_tsv', '-s', 'True', '-j', str(jobs)],
+        'cli convert(all formats)': ['convert', '-j', str(jobs)],
+    }
+    results = {}
+    for name, args in commands.items():
+        output_folder = workdir / name.replace(' ', '_').replace('(', '_').replace(')', '')
+        output_folder.mkdir(exist_ok=True)
+        runs = [run_subprocess(['-m', 'blatt.cli'] + args + [str(page_folder), str(output_folder)])
+                for _ in range(repeat)]
+        times = [run['seconds'] for run in runs]
+        seconds = statistics.median(times)
+        results[name] = {'seconds': seconds, 'min_seconds': min(times), 'pages_per_second': pages / seconds,
+                         'peak_kib': max(run['peak_kib'] for run in runs)}
+    return results
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], tolerance: float) -> bool:
+    """Prints the ratios of results to baseline. Returns False if a time or peak memory regressed by more than
+    tolerance. The minimum times are compared, as they are less sensitive to the noise of the machine."""
+    ok = True
+    click.echo('\n%-32s %12s %12s %10s %10s' % ('benchmark', 'min sec', 'baseline', 'time', 'memory'))
+    for name, result in results.items():
+        if name not in baseline:
+            click.echo('%-32s %12.6f %12s' % (name, result['min_seconds'], 'new'))
+            continue
+        stored = baseline[name]['min_seconds']
+        time_ratio = result['min_seconds'] / stored if stored else 1.0
+        memory_ratio = result['peak_kib'] / baseline[name]['peak_kib'] if baseline[name]['peak_kib'] else 1.0
+        regression = time_ratio > 1 + tolerance or memory_ratio > 1 + tolerance
+        ok = ok and not regression
+        click.echo('%-32s %12.6f %12.6f %9.2fx %9.2fx%s' % (name, result['min_seconds'], stored, time_ratio,
+                                                          memory_ratio, '  REGRESSION' if regression else ''))
+    return ok
+
+
+@click.command(context_settings=CONTEXT_SETTINGS)
+@click.option('--regions', type=int, default=10, show_default=True, help='TextRegions per page.')
+@click.option('--lines', type=int, default=25, show_default=True, help='TextLines per TextRegion.')
+@click.option('--points', type=int, default=8, show_default=True, help='Points per Baseline.')
+@click.option('--words', type=int, default=6, show_default=True, help='Words per TextLine.')
+@click.option('--glyphs', type=int, default=0, show_default=True,
+              help='Glyphs per Word. If glyphs==0, the TextLines contain no Word elements.')
+@click.option('--hyphenation', type=float, default=0.15, show_default=True,
+              help='Fraction of lines ending with a hyphen.')
+@click.option('--pages', type=int, default=200, show_default=True, help='Pages for the CLI benchmarks.')
+@click.option('--jobs', '-j', type=int, default=os.cpu_count() or 1, show_default='number of CPU cores',
+              help='Worker processes for the CLI benchmarks.')
+@click.option('--repeat', '-r', type=int, default=5, show_default=True, help='Repetitions per benchmark.')
+@click.option('--skip-cli', is_flag=True, help='Skip the CLI benchmarks.')
+@click.option('--skip-startup', is_flag=True, help='Skip the startup benchmarks.')
+@click.option('--output', '-o', type=click.Path(), help='Save the results to this JSON file.')
+@click.option('--baseline', '-b', type=click.Path(exists=True), help='Compare the results with this JSON file.')
+@click.option('--save-baseline', type=click.Path(), help='Save the results as a new baseline JSON file.')
+@click.option('--tolerance', type=float, default=0.2, show_default=True,
+              help='Allowed relative slowdown or memory growth before a benchmark counts as a regression.')
+def main(regions, lines, points, words, glyphs, hyphenation, pages, jobs, repeat, skip_cli, skip_startup, output,
+         baseline, save_baseline, tolerance):
+    """Runs the blatt benchmarks on synthetic PAGE XML files."""
+    shape = dict(regions=regions, lines=lines, points=points, words=words, glyphs=glyphs, hyphenation=hyphenation)
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        page_file = workdir / 'page.xml'
+        page_file.write_text(synthetic_page_xml(**shape), encoding='utf-8')
+        results = page_benchmarks(page_file, workdir, lines=regions * lines * 20, repeat=repeat)
+        if not skip_cli:
+            page_folder = workdir / 'pages'
+            write_synthetic_folder(page_folder, pages, **shape)
+            results.update(cli_benchmarks(page_folder, workdir, pages, jobs, max(1, repeat // 2)))
+        if not skip_startup:
+            results.update(startup_benchmarks(max(repeat, 5)))
+    for name, result in results.items():
+        extra = ' %10.1f pages/s' % result['pages_per_second'] if 'pages_per_second' in result else ''
+        click.echo('%-32s %12.6f s %10d KiB%s' % (name, result['seconds'], result['peak_kib'], extra))
+    report = {'python': platform.python_version(), 'machine': platform.machine(), 'shape': shape,
+              'pages': pages, 'jobs': jobs, 'results': results}
+    for filename in (output, save_baseline):
+        if filename:
+            with open(filename, 'w') as f:
+                json.dump(report, f, indent=2)
+    if baseline:
+        with open(baseline) as f:
+            stored = json.load(f)
+        if stored.get('shape') != shape:
+            click.echo('Warning! The baseline was recorded with another page shape: %s' % stored.get('shape'))
+        if not compare(results, stored['results'], tolerance):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
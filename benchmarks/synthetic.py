@@ -0,0 +1,83 @@
+"""
+Synthetic PAGE XML generator for the benchmarks. The generated pages look like the pages of a two-column directory
+book: TextRegions with TextLines, Baselines, Coords polygons, optional Words and Glyphs and hyphenated lines.
+"""
+from pathlib import Path
+from typing import List
+from xml.sax.saxutils import escape
+import random
+
+NAMESPACE = 'http://schema.primaresearch.org/PAGE/gts/pagecontent/2019-07-15'
+
+WORDS = ['Maschinenfabrik', 'Berlin', 'Str.', 'Inhaber:', 'Kapital:', 'die', 'und', 'Fabrikation', 'G. m. b. H.',
+         'Dir.', 'der', 'Gegründet', '1898.', 'Fernruf:', 'Werkzeugmaschinen', 'A.-G.', 'Bankverbindung:', 'in']
+HYPHENS = ['-', '⸗', '⹀']
+
+
+def synthetic_page_xml(regions: int = 10,
+                       lines: int = 25,
+                       points: int = 8,
+                       words: int = 6,
+                       glyphs: int = 0,
+                       hyphenation: float = 0.15,
+                       seed: int = 0) -> str:
+    """
+    Returns a PAGE XML document with regions TextRegions of lines TextLines each. Every Baseline has points points,
+    every TextLine has words Words with glyphs Glyphs each (glyphs==0 means no Words at all) and a fraction of
+    hyphenation of the lines ends with a hyphen.
+    """
+    r = random.Random(seed)
+    out = ['<?xml version="1.0" encoding="UTF-8"?>',
+           '<PcGts xmlns="%s"><Metadata><Creator>blatt benchmarks</Creator></Metadata>' % NAMESPACE,
+           '<Page imageFilename="page.png" imageWidth="2400" imageHeight="3600">']
+    for region in range(regions):
+        x0 = 100 if region < (regions + 1) // 2 else 1250
+        y = 100 + (region % ((regions + 1) // 2)) * lines * 50
+        out.append('<TextRegion id="r%d"><Coords points="%d,%d %d,%d %d,%d %d,%d"/>'
+                   % (region, x0, y, x0 + 1050, y, x0 + 1050, y + lines * 50, x0, y + lines * 50))
+        for line in range(lines):
+            y += r.choice((42, 44, 46, 90))
+            step = 1000 // max(points - 1, 1)
+            baseline = ' '.join('%d,%d' % (x0 + k * step, y + r.randint(-2, 2)) for k in range(points))
+            tokens = [r.choice(WORDS) for _ in range(words)]
+            text = ' '.join(tokens)
+            if r.random() < hyphenation:
+                text = text[:-2] + r.choice(HYPHENS)
+            out.append('<TextLine id="r%dl%d"><Coords points="%d,%d %d,%d %d,%d %d,%d"/><Baseline points="%s"/>'
+                       % (region, line, x0, y - 35, x0 + 1000, y - 35, x0 + 1000, y + 8, x0, y + 8, baseline))
+            if glyphs:
+                for w, token in enumerate(tokens):
+                    out.append('<Word id="r%dl%dw%d"><Coords points="1,1 2,2"/>' % (region, line, w))
+                    for g in range(glyphs):
+                        glyph = escape(token[g % len(token)])
+                        out.append('<Glyph id="r%dl%dw%dg%d"><Coords points="1,1 2,2"/><TextEquiv><Unicode>%s'
+                                   '</Unicode></TextEquiv></Glyph>' % (region, line, w, g, glyph))
+                    out.append('<TextEquiv><Unicode>%s</Unicode></TextEquiv></Word>' % escape(token))
+            out.append('<TextEquiv><Unicode>%s</Unicode></TextEquiv></TextLine>' % escape(text))
+        out.append('</TextRegion>')
+    out.append('</Page></PcGts>')
+    return '\n'.join(out)
+
+
+def synthetic_lines(n: int, hyphenation: float = 0.15, seed: int = 0) -> List[str]:
+    """Returns n OCR-like lines, a fraction of hyphenation of them ends with a hyphen."""
+    r = random.Random(seed)
+    lines = []
+    for _ in range(n):
+        line = ' '.join(r.choice(WORDS) for _ in range(6))
+        if r.random() < hyphenation:
+            line = line[:-2] + r.choice(HYPHENS)
+        lines.append(line)
+    return lines
+
+
+def write_synthetic_folder(folder: str | Path, pages: int, **kwargs) -> List[Path]:
+    """Writes pages synthetic PAGE XML files into folder and returns their paths."""
+    folder = Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for i in range(pages):
+        path = folder / ('page_%04d.xml' % i)
+        path.write_text(synthetic_page_xml(seed=i, **kwargs), encoding='utf-8')
+        paths.append(path)
+    return paths
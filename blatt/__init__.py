@@ -1 +1,17 @@
-from .page import Page
\ No newline at end of file
+from importlib import import_module
+
+__all__ = ['Page', 'Corpus', 'PackedCorpus', 'aiter_pages']
+
+# The classes and functions are imported on first access, so that e.g. `blatt -h` does not import lxml and numpy.
+_LAZY_IMPORTS = {
+    'Page': '.page',
+    'Corpus': '.corpus',
+    'PackedCorpus': '.pack',
+    'aiter_pages': '.aio',
+}
+
+
+def __getattr__(name):
+    if name in _LAZY_IMPORTS:
+        return getattr(import_module(_LAZY_IMPORTS[name], __name__), name)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
@@ -0,0 +1,82 @@
+from .page import Page
+from .parallel import worker_errors
+from collections import deque
+from concurrent.futures import Executor
+from pathlib import Path
+from typing import AsyncIterable, AsyncIterator, Iterable
+import asyncio
+import io
+
+
+def _load(filename: str, data: bytes, streaming: bool, sentences: bool) -> Page:
+    """Parses the content data of the PAGE XML file filename. Module-level to be picklable for process pools. If
+    sentences==True, the plain text and the sentences are computed as well, so that SegTok does not run later on the
+    event loop."""
+    source = io.BytesIO(data)
+    source.name = filename
+    with worker_errors(filename):
+        page = Page(source, streaming=streaming)
+        if sentences:
+            page.sentences
+    return page
+
+
+async def aload(filename: str | Path, streaming: bool = True, executor: Executor | None = None,
+                sentences: bool = False) -> Page:
+    """
+    Loads a Page without blocking the event loop. The file is read in a thread and parsed in executor (by default the
+    thread pool of the event loop; pass a ProcessPoolExecutor to parse in other processes).
+    """
+    loop = asyncio.get_running_loop()
+    filename = Path(filename)
+    data = await asyncio.to_thread(filename.read_bytes)
+    return await loop.run_in_executor(executor, _load, filename.as_posix(), data, streaming, sentences)
+
+
+async def _aiter(paths: Iterable[str | Path] | AsyncIterable[str | Path]) -> AsyncIterator[str | Path]:
+    if hasattr(paths, '__aiter__'):
+        async for path in paths:
+            yield path
+    else:
+        for path in paths:
+            yield path
+
+
+async def aiter_pages(paths: Iterable[str | Path] | AsyncIterable[str | Path], concurrency: int = 4,
+                      ordered: bool = True, streaming: bool = True, executor: Executor | None = None,
+                      sentences: bool = False) -> AsyncIterator[Page]:
+    """
+    Loads the PAGE XML files of paths (an iterable or async iterable) concurrently with aload and yields the Pages.
+    At most concurrency files are read or parsed at a time, and no new file is started before a Page is consumed,
+    so a slow consumer slows down the loading instead of piling up Pages in memory. If ordered==True, the Pages are
+    yielded in the order of paths, otherwise as soon as they are loaded.
+
+        async for page in aiter_pages(paths, concurrency=8):
+            ...
+    """
+    if concurrency < 1:
+        raise ValueError('The concurrency must be at least 1.')
+    pending = deque()
+    paths = _aiter(paths)
+    exhausted = False
+    try:
+        while True:
+            while not exhausted and len(pending) < concurrency:
+                try:
+                    path = await paths.__anext__()
+                except StopAsyncIteration:
+                    exhausted = True
+                    break
+                pending.append(asyncio.ensure_future(aload(path, streaming, executor, sentences)))
+            if not pending:
+                return
+            if ordered:
+                yield await pending.popleft()
+            else:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                task = next(task for task in pending if task in done)
+                pending.remove(task)
+                yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
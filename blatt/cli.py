@@ -1,11 +1,170 @@
 import click
-from .page import Page
+from contextlib import contextmanager, nullcontext
+from .manifest import Manifest
+from .parallel import WorkerError, worker_errors
+from .profile import Profile
+from .sources import count_sources
 from pathlib import Path
-from tqdm import tqdm
+from typing import Iterable, Iterator, Tuple
+import json
+import os
+
+# Page (lxml, numpy), tqdm and concurrent.futures are imported inside the functions that need them, so that the CLI
+# starts fast, e.g. for `blatt -h` or when it is called for single files from shell loops.
 
 CONTEXT_SETTINGS = dict(help_option_names=['-h', '--help'])
 
 
+FORMATS = {
+    'txt': '.txt',
+    'txt_linebreak': '.txt',
+    'tsv': '.tsv',
+    'tsv_sentence': '.tsv',
+    'tsv_sentence_lines': '.tsv',
+}
+
+
+def _convert(args):
+    """Worker: parses one PAGE XML file (a path or an archive member, see blatt.sources) once and saves it in all
+    requested formats. Must be module-level to be picklable. Returns the fingerprint of the input file and its profile
+    as dict if requested."""
+    from .page import Page
+    from .sources import open_source, source_name
+    source, outputs, fingerprint, splitter, profile = args
+    profile = Profile(source_name(source)) if profile else None
+    with worker_errors(source_name(source)):
+        if fingerprint:
+            with profile.stage('fingerprint') if profile else nullcontext():
+                fingerprint = Manifest.fingerprint(source)
+        p = Page(open_source(source), streaming=True, profile=profile, sentence_splitter=splitter)
+        for output_format, output_file in outputs:
+            if output_format in ('txt', 'txt_linebreak'):
+                p.to_txt(output_file, linebreak=output_format == 'txt_linebreak')
+            else:
+                p.to_tsv(output_file, sentence=output_format in ('tsv_sentence', 'tsv_sentence_lines'),
+                         lines=output_format == 'tsv_sentence_lines')
+    return fingerprint or None, profile.to_dict() if profile else None
+
+
+@contextmanager
+def _worker_errors() -> Iterator[None]:
+    """Shows the errors of the workers (see blatt.parallel.worker_errors), which name the failed file, as error
+    messages instead of tracebacks."""
+    try:
+        yield
+    except WorkerError as error:
+        raise click.ClickException(str(error))
+
+
+def _tasks(page_folder: str, incremental: bool, outputs, splitter: str = 'segtok') -> Iterator[Tuple]:
+    """Yields the tasks of _convert for the PAGE XML files in page_folder (a folder or an archive). outputs(stem)
+    returns the list of (format, output file) of a file."""
+    from .sources import iter_sources, source_stem, is_archive
+    if incremental and is_archive(page_folder):
+        raise click.UsageError('--incremental is only supported for folders, not for archives.')
+    stems = set()
+    for source in iter_sources(page_folder):
+        stem = source_stem(source)
+        if stem in stems:
+            raise click.ClickException(f'Two PAGE XML files named "{stem}" in {page_folder}.')
+        stems.add(stem)
+        yield source, outputs(stem), incremental, splitter
+
+
+def _run(tasks: Iterable[Tuple], jobs: int, manifest: Manifest | None = None, profile: str | None = None,
+         profile_top: int = 10, total: int | None = None):
+    """Runs _convert over tasks either sequentially (jobs==1) or in a pool of jobs processes. The tasks are consumed
+    lazily, so that only a few archive members are held in memory, total is their number for the progress bar (None
+    if unknown, e.g. for tar archives). If a manifest is given, the tasks with up-to-date outputs are skipped and the
+    converted files are recorded in the manifest. If profile is given, the profiles of
+    the files are aggregated and saved as JSON summary to it ('-' for stdout)."""
+    from collections import deque
+    from tqdm import tqdm
+    from .parallel import clamp_jobs, imap
+
+    def output_files(task):
+        return [output_file for _, output_file in task[1]]
+
+    def submit(tasks):
+        for task in tasks:
+            submitted.append(task)
+            yield task + (profile is not None,)
+
+    def collect(results):
+        for fingerprint, file_profile in tqdm(results, total=total):
+            task = submitted.popleft()
+            if manifest is not None:
+                manifest.update(task[0], output_files(task), fingerprint)
+            if file_profile is not None:
+                profiles.append(file_profile)
+
+    if manifest is not None:
+        tasks = list(tasks)
+        todo = [task for task in tasks if not manifest.is_up_to_date(task[0], output_files(task))]
+        if len(todo) < len(tasks):
+            click.echo(f'Skipping {len(tasks) - len(todo)} up-to-date file(s).', err=True)
+        tasks = todo
+        total = len(tasks)
+    jobs = clamp_jobs(jobs, total)
+    submitted, profiles = deque(), []
+    try:
+        with _worker_errors():
+            collect(imap(_convert, submit(tasks), jobs))
+    finally:
+        if manifest is not None:
+            manifest.save()
+    if profile is not None:
+        summary = json.dumps(Profile.summary(profiles, profile_top), indent=2)
+        if profile == '-':
+            click.echo(summary)
+        else:
+            with open(profile, 'w') as f:
+                f.write(summary)
+
+
+jobs_option = click.option('--jobs',
+                           '-j',
+                           type=click.IntRange(min=1),
+                           default=os.cpu_count() or 1,
+                           show_default='number of CPU cores',
+                           help="Number of worker processes converting the files in parallel. Use 1 to convert "
+                                "the files sequentially in the current process.")
+
+incremental_option = click.option('--incremental',
+                                  '-i',
+                                  type=bool,
+                                  default=False,
+                                  show_default=True,
+                                  help="If incremental==True, it converts only the files that changed since the last "
+                                       "conversion into the output folder. The content hashes, sizes, modification "
+                                       "times and options are recorded in the file %s there." % Manifest.FILENAME)
+
+
+splitter_option = click.option('--splitter',
+                                type=click.Choice(['segtok', 'rules']),
+                                default='segtok',
+                                show_default=True,
+                                help="Sentence splitter. segtok: the SegTok library, rules: a faster rule-based "
+                                     "splitter for historical German texts (abbreviations like 'Str.', 'Dir.', "
+                                     "'G. m. b. H.').")
+
+
+def profile_options(function):
+    """Adds the --profile and --profile-top options to a command."""
+    function = click.option('--profile-top',
+                            type=click.IntRange(min=0),
+                            default=10,
+                            show_default=True,
+                            help="Number of the slowest files listed in the profile.")(function)
+    return click.option('--profile',
+                        type=click.Path(dir_okay=False, allow_dash=True),
+                        default=None,
+                        help="Records the wall time per stage (parse, coordinates, remove_hyphens, "
+                             "split_sentences, write) and counters (TextLines, points, missing Baselines, empty "
+                             "TextEquivs, ...) of every file and saves their summary and the slowest files as JSON "
+                             "to PROFILE ('-' for stdout).")(function)
+
+
 @click.group(context_settings=CONTEXT_SETTINGS)
 def cli():
     """Blatt CLI: NLP-helper for OCR-ed pages in PAGE XML format. To get help for a particular COMMAND, use `blatt
@@ -22,15 +181,17 @@ def cli():
               show_default=True,
               help="If linebreak==False, it removes hyphens at the end of lines and merges the lines without line "
                    "breaks. Otherwise, it merges the lines using line breaks.")
+@jobs_option
+@incremental_option
+@profile_options
 @click.argument('page_folder', type=click.Path(exists=True))
 @click.argument('txt_folder', type=click.Path())
-def to_txt(page_folder, txt_folder, linebreak):
+def to_txt(page_folder, txt_folder, linebreak, jobs, incremental, profile, profile_top):
     """blatt to_txt: converts all PAGE XML files in PAGE_FOLDER to TXT files with/without hyphens in TEXT_FOLDER."""
-    file_paths = Path(page_folder).glob('*.xml')
-    for file_path in tqdm(file_paths):
-        output_file = Path(txt_folder, file_path.stem + '.txt').as_posix()
-        p = Page(file_path.as_posix())
-        p.to_txt(output_file, linebreak)
+    output_format = 'txt_linebreak' if linebreak else 'txt'
+    tasks = _tasks(page_folder, incremental, lambda stem: [(output_format, Path(txt_folder, stem + '.txt').as_posix())])
+    manifest = Manifest(txt_folder, {'command': 'to_txt', 'linebreak': linebreak}) if incremental else None
+    _run(tasks, jobs, manifest, profile, profile_top, count_sources(page_folder))
 
 
 @cli.command('to_tsv',
@@ -43,16 +204,216 @@ def to_txt(page_folder, txt_folder, linebreak):
               show_default=True,
               help="If sentence==False, it saves TextLines, TextRegionID, TextLineID and Coordinates to TSV. "
                    "Otherwise, it saves sentences (not lines!) into separate lines of TSV. The sentences are split " 
-                   "from the plain text without hyphens using the SegTok library.")
+                   "from the plain text without hyphens using the --splitter.")
+@click.option('--sentence-lines',
+              '-sl',
+              type=bool,
+              default=False,
+              show_default=True,
+              help="If sentence==True and sentence_lines==True, it saves each sentence with the TextRegionIDs, "
+                   "TextLineIDs and Baseline coordinates of the TextLines it was taken from.")
+@splitter_option
+@jobs_option
+@incremental_option
+@profile_options
 @click.argument('page_folder', type=click.Path(exists=True))
 @click.argument('tsv_folder', type=click.Path())
-def to_tsv(page_folder, tsv_folder, sentence):
+def to_tsv(page_folder, tsv_folder, sentence, sentence_lines, splitter, jobs, incremental, profile, profile_top):
     """blatt to_tsv: converts all PAGE XML files in PAGE_FOLDER to TSV files in TSV_FOLDER."""
-    file_paths = Path(page_folder).glob('*.xml')
-    for file_path in tqdm(file_paths):
-        output_file = Path(tsv_folder, file_path.stem + '.tsv').as_posix()
-        p = Page(file_path.as_posix())
-        p.to_tsv(output_file, sentence)
+    output_format = ('tsv_sentence_lines' if sentence_lines else 'tsv_sentence') if sentence else 'tsv'
+    tasks = _tasks(page_folder, incremental, lambda stem: [(output_format, Path(tsv_folder, stem + '.tsv').as_posix())],
+                   splitter)
+    options = {'command': 'to_tsv', 'sentence': sentence, 'sentence_lines': sentence_lines, 'splitter': splitter}
+    manifest = Manifest(tsv_folder, options) if incremental else None
+    _run(tasks, jobs, manifest, profile, profile_top, count_sources(page_folder))
+
+
+@cli.command('convert',
+             short_help='Converts PAGE XML files to several TXT and TSV formats parsing each file once',
+             context_settings=CONTEXT_SETTINGS)
+@click.option('--format',
+              '-f',
+              'formats',
+              type=click.Choice(list(FORMATS)),
+              multiple=True,
+              default=['txt', 'txt_linebreak', 'tsv', 'tsv_sentence'],
+              show_default=True,
+              help="Output format, can be repeated. txt: plain text without line breaks and hyphens, txt_linebreak: "
+                   "plain text with line breaks, tsv: TextLines, TextRegionID, TextLineID and Coordinates, "
+                   "tsv_sentence: sentences, tsv_sentence_lines: sentences with TextRegionIDs, TextLineIDs and "
+                   "Baseline coordinates.")
+@splitter_option
+@jobs_option
+@incremental_option
+@profile_options
+@click.argument('page_folder', type=click.Path(exists=True))
+@click.argument('output_folder', type=click.Path())
+def convert(page_folder, output_folder, formats, splitter, jobs, incremental, profile, profile_top):
+    """blatt convert: converts all PAGE XML files in PAGE_FOLDER to the selected formats. Each PAGE XML file is
+    parsed once. The files of each format are saved in the subfolder OUTPUT_FOLDER/FORMAT."""
+    formats = list(dict.fromkeys(formats))
+    for output_format in formats:
+        Path(output_folder, output_format).mkdir(parents=True, exist_ok=True)
+    tasks = _tasks(page_folder, incremental,
+                   lambda stem: [(f, Path(output_folder, f, stem + FORMATS[f]).as_posix()) for f in formats], splitter)
+    options = {'command': 'convert', 'formats': formats, 'splitter': splitter}
+    manifest = Manifest(output_folder, options) if incremental else None
+    _run(tasks, jobs, manifest, profile, profile_top, count_sources(page_folder))
+
+
+@cli.command('pack',
+             short_help='Packs parsed PAGE XML files into one memory-mappable file for fast reloading',
+             context_settings=CONTEXT_SETTINGS)
+@jobs_option
+@click.argument('page_folder', type=click.Path(exists=True))
+@click.argument('pack_file', type=click.Path(dir_okay=False))
+def pack(page_folder, pack_file, jobs):
+    """blatt pack: parses all PAGE XML files in PAGE_FOLDER and saves their TextLines, TextRegionIDs, TextLineIDs,
+    Baseline and Coords points into the single binary file PACK_FILE. Load it in Python with
+    blatt.PackedCorpus(PACK_FILE)."""
+    from .pack import pack as pack_files
+    from .parallel import clamp_jobs
+    from .sources import count_sources, iter_sources
+    with _worker_errors():
+        count = pack_files(iter_sources(page_folder), pack_file, clamp_jobs(jobs, count_sources(page_folder)))
+    click.echo(f'Packed {count} file(s) into {pack_file}.', err=True)
+
+
+def _records(args):
+    """Worker: parses one PAGE XML file (a path or the bytes of a document read from stdin) and returns its records as
+    JSON Lines."""
+    from .page import Page
+    from .sources import open_source, source_name
+    source, level, splitter = args
+    with worker_errors(source_name(source)):
+        page = Page(open_source(source), streaming=True, sentence_splitter=splitter)
+        return ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in page.records(level))
+
+
+def _jsonl_sources(paths):
+    """Yields the PAGE XML files of paths or, without paths, of the lines of stdin. Folders and archives are expanded
+    to their XML files, '-' stands for a single document read from stdin."""
+    import sys
+    from .sources import iter_sources
+    if not paths:
+        paths = (line.strip() for line in sys.stdin)
+    for path in paths:
+        if not path:
+            continue
+        if path == '-':
+            yield '-', sys.stdin.buffer.read()
+        else:
+            yield from iter_sources(path)
+
+
+@cli.command('to_jsonl',
+             short_help='Streams PAGE XML files as JSON Lines records per page, TextLine or sentence to stdout',
+             context_settings=CONTEXT_SETTINGS)
+@click.option('--level',
+              '-l',
+              type=click.Choice(['page', 'line', 'sentence']),
+              default='line',
+              show_default=True,
+              help="page: one record per file with the plain text without hyphens and all TextLines, line: one record "
+                   "per TextLine with TextRegionID, TextLineID, Baseline and Coords points, sentence: one record per "
+                   "sentence with the TextRegionIDs, TextLineIDs, Baseline and Coords points of its TextLines.")
+@splitter_option
+@jobs_option
+@click.argument('paths', nargs=-1, type=click.Path(allow_dash=True))
+def to_jsonl(paths, level, splitter, jobs):
+    """blatt to_jsonl: writes the PAGE XML files in PATHS (files, folders or archives) as JSON Lines to stdout.
+    Without PATHS, the paths are read from stdin, one per line. PATHS '-' reads a single PAGE XML document from stdin.
+    The records are written in input order while the files are converted, no files are written."""
+    import sys
+    from .parallel import imap
+    try:
+        with _worker_errors():
+            for chunk in imap(_records, ((source, level, splitter) for source in _jsonl_sources(paths)), jobs):
+                sys.stdout.write(chunk)
+        sys.stdout.flush()
+    except BrokenPipeError:
+        # The reader closed the pipe (e.g. `| head`): silence the flush at exit.
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        sys.exit(1)
+
+
+def _grid(ctx, param, value):
+    """Parses a grid of thresholds: start:stop:step (stop included) or a comma-separated list."""
+    try:
+        if ':' in value:
+            start, stop, step = (float(part) for part in value.split(':'))
+            if step <= 0 or stop < start:
+                raise ValueError
+            return [start + i * step for i in range(int((stop - start) / step + 1e-9) + 1)]
+        return [float(part) for part in value.split(',')]
+    except ValueError:
+        raise click.BadParameter(f'{value!r} is neither start:stop:step nor a comma-separated list of numbers.')
+
+
+@cli.command('sweep',
+             short_help='Counts the segments and entries of a book for a grid of segmentation thresholds',
+             context_settings=CONTEXT_SETTINGS)
+@click.option('--min-dy',
+              default='40:160:10',
+              show_default=True,
+              callback=_grid,
+              help="Thresholds for the distance dy0 between consecutive lines which splits segments, as "
+                   "start:stop:step or a comma-separated list.")
+@click.option('--max-dy',
+              default='20:100:10',
+              show_default=True,
+              callback=_grid,
+              help="Thresholds for the distances dy0 after the first two lines of a page under which its first "
+                   "segment continues the last segment of the previous page, as start:stop:step or a "
+                   "comma-separated list.")
+@click.option('--columns',
+              '-c',
+              type=click.IntRange(min=1),
+              default=2,
+              show_default=True,
+              help="Number of columns per page.")
+@click.option('--bins',
+              type=click.IntRange(min=1),
+              default=30,
+              show_default=True,
+              help="Number of bins of the histogram of the distances between lines.")
+@click.option('--cache',
+              type=click.Path(dir_okay=False),
+              default=None,
+              help="NPZ file with the distances between lines: loaded if it exists, otherwise saved after parsing "
+                   "the pages, so that further sweeps do not parse them again.")
+@jobs_option
+@click.argument('page_folder', type=click.Path(exists=True))
+def sweep(page_folder, min_dy, max_dy, columns, bins, cache, jobs):
+    """blatt sweep: parses the PAGE XML files of a book in PAGE_FOLDER (a folder or an archive) once and writes the
+    number of segments, of segments merged across page breaks and of entries for every pair of thresholds MIN_DY and
+    MAX_DY as TSV to stdout. The histogram of the distances between lines and suggested thresholds are written to
+    stderr."""
+    from .parallel import clamp_jobs
+    from .sources import count_sources, iter_sources
+    from .sweep import book_gaps, gap_histogram, load_gaps, save_gaps, suggest_thresholds, sweep as sweep_gaps
+    if cache and Path(cache).exists():
+        gaps = load_gaps(cache)
+    else:
+        with _worker_errors():
+            gaps = book_gaps(iter_sources(page_folder), columns, clamp_jobs(jobs, count_sources(page_folder)))
+        if cache:
+            save_gaps(gaps, cache)
+    click.echo('min_dy\tmax_dy\tsegments\tmerged\tentries')
+    for row in sweep_gaps(gaps, min_dy, max_dy):
+        click.echo('\t'.join(f'{value:g}' for value in row.tolist()))
+    try:
+        counts, edges = gap_histogram(gaps, bins)
+        suggested = suggest_thresholds(gaps)
+    except ValueError as error:
+        click.echo(error, err=True)
+        return
+    click.echo('Distances between lines:', err=True)
+    for count, start, stop in zip(counts.tolist(), edges[:-1].tolist(), edges[1:].tolist()):
+        bar = '#' * round(50 * count / max(counts.max(), 1))
+        click.echo(f'{start:8.1f} - {stop:8.1f} {count:8d} {bar}', err=True)
+    click.echo('Suggested thresholds: ' + ', '.join(f'{name}={value:g}' for name, value in suggested.items()), err=True)
 
 
 if __name__ == '__main__':
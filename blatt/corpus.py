@@ -0,0 +1,74 @@
+from .page import Page
+from .sentences import SentenceSplitter, get_splitter
+from pathlib import Path
+from typing import Iterable, Iterator, List
+
+
+class Corpus:
+    """
+    Class Corpus: An ordered collection of PAGE XML files, e.g. the pages of a book. Takes a folder (the files matching
+    pattern are sorted by name) or an ordered list of files. Streams the Pages one by one, so that the memory is
+    bounded by one Page, not by the book. Removes hyphens across page breaks and yields book-wide text and sentences.
+    The sentences are split with the sentence_splitter (see blatt.sentences).
+    """
+    def __init__(self, source: str | Path | Iterable[str | Path], pattern: str = '*.xml', streaming: bool = True,
+                 sentence_splitter: str | SentenceSplitter = 'segtok'):
+        if isinstance(source, (str, Path)):
+            if not Path(source).is_dir():
+                raise ValueError(f'Path "{source}" is not a folder. Pass a folder or a list of PAGE XML files.')
+            self.filenames: List[Path] = sorted(Path(source).glob(pattern))
+        else:
+            self.filenames: List[Path] = [Path(filename) for filename in source]
+        self.streaming: bool = streaming
+        self.sentence_splitter: SentenceSplitter = get_splitter(sentence_splitter)
+
+    def __repr__(self):
+        return f'Corpus({len(self.filenames)} PAGE XML files)'
+
+    def __len__(self):
+        return len(self.filenames)
+
+    def __iter__(self) -> Iterator[Page]:
+        return self.pages()
+
+    def pages(self) -> Iterator[Page]:
+        """Yields the Pages in order. Each Page is parsed when it is requested."""
+        for filename in self.filenames:
+            yield Page(filename, streaming=self.streaming, sentence_splitter=self.sentence_splitter)
+
+    def lines(self) -> Iterator[str]:
+        """Yields the TextLines of all Pages in order."""
+        for page in self.pages():
+            yield from page.text_lines
+
+    def iter_text(self) -> Iterator[str]:
+        """Yields the plain text of the book without line breaks and hyphens in chunks. Words hyphenated across the
+        last line of a page and the first line of the next page are joined like any other hyphenated words."""
+        return Page.iter_remove_hyphens(self.lines())
+
+    def text(self) -> str:
+        """Returns the plain text of the book without line breaks and hyphens."""
+        return ''.join(self.iter_text())
+
+    def sentences(self, chunk_size: int = 10000) -> Iterator[str]:
+        """Yields the sentences of the book. The text is split in chunks of at least chunk_size characters using
+        the sentence_splitter. The last (possibly incomplete) sentence of a chunk is prepended to the next chunk, so
+        sentences spanning page breaks are kept together."""
+        buffer = []
+        size = 0
+        for chunk in self.iter_text():
+            buffer.append(chunk)
+            size += len(chunk)
+            if size >= chunk_size:
+                text = ''.join(buffer)
+                sentences = self.sentence_splitter.split(text)
+                yield from sentences[:-1]
+                if sentences:
+                    start = text.rfind(sentences[-1])
+                    rest = text[start:] if start >= 0 else sentences[-1]
+                else:
+                    rest = text
+                buffer, size = [rest], len(rest)
+        text = ''.join(buffer)
+        if text:
+            yield from self.sentence_splitter.split(text)
@@ -0,0 +1,93 @@
+from collections import deque
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Tuple
+import json
+
+
+class Gazetteer:
+    """
+    Class Gazetteer: Tags texts with the labels of dictionary patterns, e.g. legal forms {'GmbH': ['G. m. b. H.',
+    'Ges. m. b. H.'], 'AG': ['A.-G.', 'Aktiengesellschaft']}. The patterns are compiled into an Aho-Corasick automaton,
+    so a text is scanned once for all patterns and the runtime does not grow with their number. Patterns match
+    anywhere in the text (also inside words), by default ignoring the case.
+    """
+    def __init__(self, patterns: Dict[str, Iterable[str]], ignore_case: bool = True):
+        self.ignore_case: bool = ignore_case
+        self._order: Dict[str, int] = {label: i for i, label in enumerate(patterns)}
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Tuple[Tuple[int, str], ...]] = [()]
+        for label, label_patterns in patterns.items():
+            for pattern in label_patterns:
+                self._add(pattern, label)
+        self._build()
+
+    def __repr__(self):
+        return f'Gazetteer({len(self._order)} labels, {len(self._goto)} states)'
+
+    @classmethod
+    def load(cls, filename: str | Path, **kwargs) -> 'Gazetteer':
+        """Loads the patterns from a JSON file with an object {label: [patterns]}."""
+        with open(filename, encoding='utf-8') as f:
+            return cls(json.load(f), **kwargs)
+
+    def _fold(self, text: str) -> str:
+        """Returns text in lower case if ignore_case. Characters whose lower case has another length are kept, so
+        that the positions in the folded text are the positions in text."""
+        if not self.ignore_case:
+            return text
+        folded = text.lower()
+        if len(folded) == len(text):
+            return folded
+        return ''.join(c.lower() if len(c.lower()) == 1 else c for c in text)
+
+    def _add(self, pattern: str, label: str):
+        if not pattern:
+            raise ValueError(f'Empty pattern for label {label!r}.')
+        node = 0
+        for c in self._fold(pattern):
+            if c not in self._goto[node]:
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(())
+                self._goto[node][c] = len(self._goto) - 1
+            node = self._goto[node][c]
+        if (len(pattern), label) not in self._output[node]:
+            self._output[node] += ((len(pattern), label),)
+
+    def _build(self):
+        """Sets the failure links (the longest proper suffix that is a prefix of a pattern) in breadth-first order
+        and adds the outputs of the suffixes to every state."""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for c, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and c not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(c, 0)
+                self._output[child] += self._output[self._fail[child]]
+                queue.append(child)
+
+    def find(self, text: str) -> List[Tuple[int, int, str]]:
+        """Returns all (also overlapping) matches in text as (start, end, label), sorted by start and end."""
+        goto, fail, output = self._goto, self._fail, self._output
+        matches = []
+        node = 0
+        for i, c in enumerate(self._fold(text), 1):
+            while node and c not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(c, 0)
+            for length, label in output[node]:
+                matches.append((i - length, i, label))
+        matches.sort()
+        return matches
+
+    def labels(self, text: str) -> List[str]:
+        """Returns the labels matching text, each once, in the order of the patterns dictionary."""
+        return sorted({label for _, _, label in self.find(text)}, key=self._order.__getitem__)
+
+    def tag(self, texts: Iterable[str]) -> Iterator[List[Tuple[int, int, str]]]:
+        """Yields the matches (see find) of each of texts, e.g. the lines of a Corpus or the fields of a table."""
+        for text in texts:
+            yield self.find(text)
@@ -0,0 +1,127 @@
+from collections import defaultdict
+from difflib import SequenceMatcher
+from pathlib import Path
+from typing import Dict, Iterable, List, Set, Tuple
+import json
+import math
+
+
+class KeyNormalizer:
+    """
+    Class KeyNormalizer: Normalizes the keys of key-value records, e.g. the properties of directory entries, whose OCR
+    variants ('Postscheck-Konto', 'Postseheck-Konto', 'Fostscheck-Konto') should end up in one column. Curated
+    mappings from canonical keys to their variants are given as a dict or loaded from a JSON file (see load). cluster
+    groups the keys by similarity with an index of their character n-grams, so only keys sharing n-grams are compared
+    instead of all pairs.
+    """
+    def __init__(self, canonical: Dict[str, Iterable[str]] | None = None, cutoff: float = 0.65, n: int = 3):
+        self.canonical: Dict[str, str] = {}
+        for key, variants in (canonical or {}).items():
+            for variant in variants:
+                if self.canonical.get(variant, key) != key:
+                    raise ValueError(f'Key {variant!r} is a variant of {self.canonical[variant]!r} and {key!r}.')
+                self.canonical[variant] = key
+        self.cutoff: float = cutoff
+        self.n: int = n
+
+    def __repr__(self):
+        return f'KeyNormalizer({len(set(self.canonical.values()))} canonical keys, {len(self.canonical)} variants)'
+
+    @classmethod
+    def load(cls, filename: str | Path, **kwargs) -> 'KeyNormalizer':
+        """Loads the canonical keys from a JSON file with an object {canonical key: [variants]}."""
+        with open(filename, encoding='utf-8') as f:
+            return cls(json.load(f), **kwargs)
+
+    def save(self, filename: str | Path):
+        """Saves the canonical keys as JSON file (see load)."""
+        canonical = defaultdict(list)
+        for variant, key in self.canonical.items():
+            canonical[key].append(variant)
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump(canonical, f, ensure_ascii=False, indent=2)
+
+    def normalize(self, key: str) -> str:
+        """Returns the canonical key of key or key itself."""
+        return self.canonical.get(key, key)
+
+    def merge(self, items: Iterable[Tuple[str, str]], separator: str = '; ') -> Dict[str, str]:
+        """Returns a dict of the items (key, value) by canonical key. The values of keys with the same canonical key
+        are joined with separator in order."""
+        merged = {}
+        for key, value in items:
+            key = self.normalize(key)
+            if not merged.get(key):
+                merged[key] = value
+            elif value:
+                merged[key] += separator + value
+        return merged
+
+    def _ngrams(self, key: str) -> Set[str]:
+        padded = ' ' * (self.n - 1) + key.lower() + ' ' * (self.n - 1)
+        return {padded[i:i + self.n] for i in range(len(padded) - self.n + 1)}
+
+    def _similar(self, matcher: SequenceMatcher, a: str) -> bool:
+        matcher.set_seq1(a)
+        return (matcher.real_quick_ratio() >= self.cutoff and matcher.quick_ratio() >= self.cutoff
+                and matcher.ratio() >= self.cutoff)
+
+    def similar(self, a: str, b: str) -> bool:
+        """Checks whether the keys a and b are similar: difflib's ratio is at least cutoff (as for
+        difflib.get_close_matches)."""
+        matcher = SequenceMatcher()
+        matcher.set_seq2(b)
+        return self._similar(matcher, a)
+
+    def cluster(self, keys: Iterable[str], exact: bool = False) -> List[List[str]]:
+        """
+        Groups the keys into clusters of variants: keys with the same canonical key and similar keys (see similar)
+        end up in the same cluster, also transitively. Candidate pairs are found with an inverted index of the
+        character n-grams of the keys, so only keys sharing n-grams are compared. This is an approximation: similar
+        keys without a common n-gram (e.g. 'egecd' and 'gcdc') are not compared. If exact==True, all pairs of keys
+        whose lengths allow a ratio of cutoff (see SequenceMatcher.real_quick_ratio) are compared instead, which gives
+        the clusters of comparing all pairs but is slower. Returns the clusters in the order of their first keys, the
+        keys of a cluster in order.
+        """
+        keys = list(dict.fromkeys(keys))
+        parent = list(range(len(keys)))
+
+        def find(i: int) -> int:
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        def union(i: int, j: int):
+            i, j = find(i), find(j)
+            if i != j:
+                parent[max(i, j)] = min(i, j)
+
+        longest = max(map(len, keys), default=0)
+
+        def lengths(key: str) -> range:
+            # 2 * min(len(a), len(b)) / (len(a) + len(b)) >= cutoff
+            if self.cutoff <= 0:
+                return range(longest + 1)
+            return range(math.floor(len(key) * self.cutoff / (2 - self.cutoff)),
+                         min(math.ceil(len(key) * (2 - self.cutoff) / self.cutoff), longest) + 1)
+
+        first = {}
+        for i, key in enumerate(keys):
+            union(i, first.setdefault(self.normalize(key), i))
+        index = defaultdict(list)
+        matcher = SequenceMatcher()
+        for i, key in enumerate(keys):
+            # the keys are indexed by length (exact) or by their n-grams
+            features = lengths(key) if exact else self._ngrams(key)
+            # SequenceMatcher caches the analysis of its second sequence, the candidates are the first one
+            matcher.set_seq2(key)
+            for j in sorted({j for feature in features for j in index.get(feature, ())}):
+                if find(i) != find(j) and self._similar(matcher, keys[j]):
+                    union(i, j)
+            for feature in ([len(key)] if exact else features):
+                index[feature].append(i)
+        clusters = defaultdict(list)
+        for i, key in enumerate(keys):
+            clusters[find(i)].append(key)
+        return list(clusters.values())
@@ -0,0 +1,164 @@
+"""
+Vectorized layout analysis on the geometry arrays of a Page: column detection, reading order and segmentation of the
+lines into segments (e.g. the entries of a directory) at large vertical gaps. The functions work on NumPy arrays and
+run in microseconds per page, page_layout combines them. merge_segments joins the segments continued across page
+breaks, iter_book_segments streams the merged segments of a whole book.
+"""
+from typing import Any, Callable, Dict, Hashable, Iterable, Iterator, List, Sequence, Tuple
+import numpy as np
+
+SEGMENT_DTYPE = np.dtype([('segment', np.int64), ('column', np.int64), ('start', np.int64), ('stop', np.int64),
+                          ('top', np.float64), ('bottom', np.float64)])
+
+
+def line_geometry(page) -> Dict[str, np.ndarray]:
+    """Returns x0 and y0 (first Baseline point) and y1 (second Baseline point, or the first one if there is only one)
+    for every entry of page.text_lines. Lines without Baseline points get NaN."""
+    index = page.text_line_index
+    starts, ends = page.baseline_offsets[index], page.baseline_offsets[index + 1]
+    has_points = ends > starts
+    points = page.baseline_points.astype(np.float64)
+    if not len(points):
+        points = np.zeros((1, 2))
+    first = np.where(has_points[:, None], points[np.minimum(starts, len(points) - 1)], np.nan)
+    second = np.where(has_points[:, None], points[np.clip(np.minimum(starts + 1, ends - 1), 0, len(points) - 1)],
+                      np.nan)
+    return {'x0': first[:, 0], 'y0': first[:, 1], 'y1': second[:, 1]}
+
+
+def column_boundaries(x: np.ndarray, columns: int = 2) -> np.ndarray:
+    """Detects the boundaries between columns from the x coordinates of the line starts: the columns-1 largest gaps
+    between the sorted x coordinates. A boundary is the last x before a gap, so that x <= boundary is the left
+    column."""
+    x = np.unique(x[~np.isnan(x)])
+    if columns < 2 or len(x) < 2:
+        return np.empty(0)
+    gaps = np.diff(x)
+    largest = np.sort(np.argsort(gaps, kind='stable')[::-1][:columns - 1])
+    return x[largest]
+
+
+def assign_columns(x: np.ndarray, boundaries: Sequence[float]) -> np.ndarray:
+    """Returns the column of every x: 0 for x <= boundaries[0], 1 for boundaries[0] < x <= boundaries[1] etc."""
+    return np.searchsorted(np.sort(np.asarray(boundaries, dtype=np.float64)), x, side='left')
+
+
+def reading_order(columns: np.ndarray, y: np.ndarray, x: np.ndarray) -> np.ndarray:
+    """Returns the indices of the lines sorted by column, then by y, then by x."""
+    return np.lexsort((x, y, columns))
+
+
+def gap_boundaries(dy: np.ndarray, min_dy: float) -> np.ndarray:
+    """Marks the lines after which a new segment starts: |dy| >= min_dy (NaN never marks a boundary)."""
+    with np.errstate(invalid='ignore'):
+        return np.abs(dy) >= min_dy
+
+
+def segment_ids(boundaries: np.ndarray) -> np.ndarray:
+    """Returns the segment ID of every line: the number of boundaries before it. A line marked as boundary is the
+    last line of its segment."""
+    boundaries = np.asarray(boundaries, dtype=bool)
+    return np.cumsum(boundaries) - boundaries
+
+
+def segment_table(segments: np.ndarray, columns: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """Returns one row per segment (segment ID, column of its first line, start and stop position of its lines,
+    top and bottom y) as a structured array with SEGMENT_DTYPE. segments, columns and y are in reading order."""
+    if not len(segments):
+        return np.empty(0, dtype=SEGMENT_DTYPE)
+    starts = np.flatnonzero(np.r_[True, segments[1:] != segments[:-1]])
+    stops = np.r_[starts[1:], len(segments)]
+    table = np.empty(len(starts), dtype=SEGMENT_DTYPE)
+    table['segment'] = segments[starts]
+    table['column'] = columns[starts]
+    table['start'] = starts
+    table['stop'] = stops
+    y = np.where(np.isnan(y), np.inf, y)
+    table['top'] = np.minimum.reduceat(y, starts)
+    table['bottom'] = np.maximum.reduceat(np.where(np.isinf(y), -np.inf, y), starts)
+    return table
+
+
+def page_layout(page, columns: int = 2, boundaries: Sequence[float] | None = None,
+                min_dy: float = 86) -> Dict[str, np.ndarray]:
+    """
+    Detects the columns of page (or uses the given column boundaries, e.g. [page.center_baseline[0]]), sorts the
+    entries of page.text_lines into reading order (column, mean y of the first two Baseline points, x) and splits them
+    into segments where the vertical distance dy0 between the first Baseline points of consecutive lines is at least
+    min_dy. Returns the arrays (in reading order) 'order' (indices into page.text_lines), 'column', 'x0', 'y0', 'y1',
+    'ym', 'dy0' (NaN for the last line), 'boundary' and 'segment', and the segment table 'segments' (see
+    segment_table).
+    """
+    geometry = line_geometry(page)
+    x0, y0, y1 = geometry['x0'], geometry['y0'], geometry['y1']
+    if boundaries is None:
+        boundaries = column_boundaries(x0, columns)
+    column = assign_columns(x0, boundaries)
+    ym = (y0 + y1) * 0.5
+    order = reading_order(column, ym, x0)
+    column, x0, y0, y1, ym = column[order], x0[order], y0[order], y1[order], ym[order]
+    dy0 = np.r_[y0[1:] - y0[:-1], np.nan]
+    boundary = gap_boundaries(dy0, min_dy)
+    segment = segment_ids(boundary)
+    return {'order': order, 'column': column, 'x0': x0, 'y0': y0, 'y1': y1, 'ym': ym, 'dy0': dy0,
+            'boundary': boundary, 'segment': segment, 'segments': segment_table(segment, column, ym)}
+
+
+def continues_segment(lines: Sequence[Sequence], max_dy: float) -> bool:
+    """Checks whether a segment, given by its lines (text, line ID, dy0), continues the previous segment: if the
+    distances dy0 after its first two lines are at most max_dy or both lines contain ':'. Segments with less than two
+    lines never continue."""
+    if len(lines) < 2:
+        return False
+    (text0, _, dy0), (text1, _, dy1) = lines[0][:3], lines[1][:3]
+    return bool((dy0 <= max_dy and dy1 <= max_dy) or (':' in text0 and ':' in text1))
+
+
+def iter_merge_segments(segments: Iterable[Tuple[Hashable, List, bool]],
+                        max_dy: float) -> Iterator[Tuple[Hashable, List]]:
+    """
+    Merges segments across page breaks in a single pass. segments are (key, lines, first) in reading order of the
+    book, where lines are (text, line ID, dy0) and first marks the segments which may continue the previous one
+    (e.g. the first segment of a page). Such a segment is appended to the nearest preceding segment that was not
+    merged itself, if continues_segment says so. Yields the merged segments (key, lines) in order as soon as they are
+    complete, so only one segment is held back.
+    """
+    last = None
+    for key, lines, first in segments:
+        if first and last is not None and continues_segment(lines, max_dy):
+            last[1].extend(lines)
+            continue
+        if last is not None:
+            yield last
+        last = (key, list(lines))
+    if last is not None:
+        yield last
+
+
+def merge_segments(segments: Iterable[Tuple[Hashable, List, bool]], max_dy: float) -> Dict[Hashable, List]:
+    """Merges segments across page breaks (see iter_merge_segments) and returns the merged segments by key in order."""
+    return dict(iter_merge_segments(segments, max_dy))
+
+
+def _page_segments(page_segments: Callable[[Any], List[Tuple[Hashable, List, bool]]],
+                   path: Any) -> List[Tuple[Hashable, List, bool]]:
+    """Worker of iter_book_segments: calls page_segments(path) and names path in its errors."""
+    from .parallel import worker_errors
+    from .sources import source_name
+    with worker_errors(source_name(path) if isinstance(path, (str, tuple)) else str(path)):
+        return page_segments(path)
+
+
+def iter_book_segments(paths: Iterable[Any], page_segments: Callable[[Any], List[Tuple[Hashable, List, bool]]],
+                       max_dy: float, jobs: int = 1, window: int | None = None) -> Iterator[Tuple[Hashable, List]]:
+    """
+    Yields the merged segments (key, lines) of a book in order. page_segments parses and segments one page (e.g. a
+    path) and returns its segments (key, lines, first) for iter_merge_segments. The pages are processed in a pool of
+    jobs processes with at most window pages in flight (see blatt.parallel.imap), so only their segments, not the
+    Pages, are kept, and the memory does not grow with the size of the book. page_segments must be picklable
+    (module-level). Its errors are raised as blatt.parallel.WorkerError with the path.
+    """
+    from functools import partial
+    from .parallel import imap
+    pages = imap(partial(_page_segments, page_segments), paths, jobs, window)
+    yield from iter_merge_segments((segment for segments in pages for segment in segments), max_dy)
@@ -0,0 +1,80 @@
+from pathlib import Path
+from typing import Dict, List
+import hashlib
+import json
+import os
+
+
+class Manifest:
+    """
+    Class Manifest: Records content hashes, sizes, modification times and conversion options of the converted PAGE XML
+    files in a JSON file in the output folder. Tells whether the output of an input file is up-to-date, so that
+    unchanged files can be skipped when a folder is converted again.
+    """
+    FILENAME = '.blatt-manifest.json'
+
+    def __init__(self, folder: str | Path, options: Dict):
+        self.filename: Path = Path(folder, self.FILENAME)
+        self.options: Dict = options
+        self.entries: Dict[str, Dict] = self._load()
+        self.changed: bool = False
+
+    def __repr__(self):
+        return f'Manifest({self.filename.as_posix()!r}, {len(self.entries)} entries)'
+
+    def _load(self) -> Dict[str, Dict]:
+        """Loads the entries from the manifest file. A missing or unreadable manifest gives no entries."""
+        try:
+            with open(self.filename) as f:
+                return json.load(f)['entries']
+        except (OSError, ValueError, KeyError, TypeError):
+            return {}
+
+    @staticmethod
+    def _key(input_file: str | Path) -> str:
+        return Path(input_file).resolve().as_posix()
+
+    @staticmethod
+    def fingerprint(input_file: str | Path) -> Dict:
+        """Returns size, modification time (ns) and SHA-256 hash of the content of input_file."""
+        stat = os.stat(input_file)
+        with open(input_file, 'rb') as f:
+            sha256 = hashlib.sha256(f.read()).hexdigest()
+        return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': sha256}
+
+    def is_up_to_date(self, input_file: str | Path, output_files: List[str | Path]) -> bool:
+        """Checks whether output_files were converted from the current content of input_file with the same options.
+        The content hash is only computed if size or modification time of input_file changed."""
+        entry = self.entries.get(self._key(input_file))
+        if not entry or entry['options'] != self.options:
+            return False
+        if entry.get('outputs') != [self._key(f) for f in output_files]:
+            return False
+        if not all(Path(f).is_file() for f in output_files):
+            return False
+        stat = os.stat(input_file)
+        if stat.st_size == entry['size'] and stat.st_mtime_ns == entry['mtime_ns']:
+            return True
+        fingerprint = self.fingerprint(input_file)
+        if fingerprint['sha256'] != entry['sha256']:
+            return False
+        entry.update(fingerprint)  # touched but unchanged: remember the new mtime
+        self.changed = True
+        return True
+
+    def update(self, input_file: str | Path, output_files: List[str | Path], fingerprint: Dict):
+        """Records that output_files were converted from input_file with the given fingerprint."""
+        self.entries[self._key(input_file)] = {**fingerprint,
+                                               'options': self.options,
+                                               'outputs': [self._key(f) for f in output_files]}
+        self.changed = True
+
+    def save(self):
+        """Writes the manifest file atomically if any entry was changed."""
+        if not self.changed:
+            return
+        temporary = self.filename.with_name(self.filename.name + '.tmp')
+        with open(temporary, 'w') as f:
+            json.dump({'entries': self.entries}, f, ensure_ascii=False)
+        os.replace(temporary, self.filename)
+        self.changed = False
@@ -0,0 +1,234 @@
+from .corpus import Corpus
+from .page import Page
+from .parallel import worker_errors
+from .sentences import SentenceSplitter, get_splitter
+from .sources import Source, open_source, source_name
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Tuple
+import json
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+import numpy as np
+
+# Layout of a packed corpus file: MAGIC, the version and the start of the arrays (struct HEADER), the JSON header
+# with the filenames and the dtype, shape and position of every array, and the arrays, each aligned to ALIGNMENT bytes.
+# Strings are stored as concatenated UTF-8 bytes with an offsets array. All offsets are global, the ranges of page i
+# are given by page_entries[i:i + 2] (entries of text_lines) and page_text_lines[i:i + 2] (TextLines).
+MAGIC = b'BLATTPAK'
+VERSION = 1
+HEADER = struct.Struct('<8sIQ')
+ALIGNMENT = 64
+
+ARRAYS = {
+    'page_entries': ('<i8', ()),
+    'page_text_lines': ('<i8', ()),
+    'text': ('u1', ()),
+    'text_offsets': ('<i8', ()),
+    'text_line_index': ('<i8', ()),
+    'line_ids': ('u1', ()),
+    'line_id_offsets': ('<i8', ()),
+    'line_region_ids': ('<i4', ()),
+    'baseline_points': ('<i4', (2,)),
+    'baseline_offsets': ('<i8', ()),
+    'coords_points': ('<i4', (2,)),
+    'coords_offsets': ('<i8', ()),
+}
+
+
+def _page_arrays(source: Source) -> Tuple[str, List[str], Dict[str, np.ndarray]]:
+    """Worker: parses a PAGE XML file (a path or an archive member, see blatt.sources) and returns its filename,
+    text_lines and arrays. Module-level to be picklable."""
+    with worker_errors(source_name(source)):
+        page = Page(open_source(source), streaming=True)
+        arrays = page.to_arrays()
+    return page.filename.as_posix(), page.text_lines, {name: arrays[name] for name in (
+        'line_ids', 'line_region_ids', 'text_line_index', 'baseline_points', 'baseline_offsets', 'coords_points',
+        'coords_offsets')}
+
+
+class PackWriter:
+    """
+    Class PackWriter: Writes Pages one by one into a packed corpus file. The arrays are spilled into temporary files
+    while the Pages are added, so that the memory is bounded by one Page. The file is written atomically on close().
+    """
+    def __init__(self, filename: str | Path):
+        self.filename: Path = Path(filename)
+        self.filenames: List[str] = []
+        self._files = {name: tempfile.TemporaryFile() for name in ARRAYS}
+        self._sizes: Dict[str, int] = dict.fromkeys(ARRAYS, 0)
+        # the offsets arrays start with 0, the other values are appended per page
+        self._totals: Dict[str, int] = {'page_entries': 0, 'page_text_lines': 0, 'text_offsets': 0,
+                                        'line_id_offsets': 0, 'baseline_offsets': 0, 'coords_offsets': 0}
+        for name in self._totals:
+            self._write(name, np.zeros(1))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self._discard()
+
+    def _write(self, name: str, values: np.ndarray):
+        values = np.ascontiguousarray(values, dtype=ARRAYS[name][0])
+        self._files[name].write(values.tobytes())
+        self._sizes[name] += len(values)
+
+    def _write_offsets(self, name: str, sizes: np.ndarray):
+        """Appends the ends of consecutive ranges of the given sizes to the global offsets array name."""
+        ends = self._totals[name] + np.cumsum(sizes, dtype=np.int64)
+        self._write(name, ends)
+        if len(ends):
+            self._totals[name] = int(ends[-1])
+
+    def add_arrays(self, filename: str, text_lines: List[str], arrays: Dict[str, np.ndarray]):
+        """Adds a Page given by its filename, text_lines and the arrays of Page.to_arrays()."""
+        text_line_count = self._sizes['line_region_ids']
+        self.filenames.append(filename)
+        self._write_offsets('page_entries', [len(text_lines)])
+        self._write_offsets('page_text_lines', [len(arrays['line_ids'])])
+        encoded = [line.encode('utf-8') for line in text_lines]
+        self._write('text', np.frombuffer(b''.join(encoded), dtype=np.uint8))
+        self._write_offsets('text_offsets', [len(line) for line in encoded])
+        self._write('text_line_index', arrays['text_line_index'] + text_line_count)
+        encoded = [str(line_id).encode('utf-8') for line_id in arrays['line_ids']]
+        self._write('line_ids', np.frombuffer(b''.join(encoded), dtype=np.uint8))
+        self._write_offsets('line_id_offsets', [len(line_id) for line_id in encoded])
+        self._write('line_region_ids', arrays['line_region_ids'])
+        for name in ('baseline', 'coords'):
+            self._write(name + '_points', arrays[name + '_points'])
+            self._write_offsets(name + '_offsets', np.diff(arrays[name + '_offsets']))
+
+    def add(self, page: Page):
+        """Adds a Page."""
+        self.add_arrays(page.filename.as_posix(), page.text_lines, page.to_arrays())
+
+    def close(self):
+        """Writes the header and the arrays into the packed corpus file."""
+        header = {'version': VERSION, 'filenames': self.filenames, 'arrays': {}}
+        position = 0
+        for name, (dtype, shape) in ARRAYS.items():
+            header['arrays'][name] = {'dtype': dtype, 'shape': [self._sizes[name], *shape], 'offset': position}
+            size = self._files[name].tell()
+            position += size + (-size) % ALIGNMENT
+        encoded = json.dumps(header, ensure_ascii=False).encode('utf-8')
+        start = HEADER.size + len(encoded)
+        start += (-start) % ALIGNMENT
+        temporary = self.filename.with_name(self.filename.name + '.tmp')
+        with open(temporary, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, start))
+            f.write(encoded)
+            f.write(b'\0' * (start - f.tell()))
+            for name in ARRAYS:
+                spill = self._files[name]
+                spill.seek(0)
+                shutil.copyfileobj(spill, f)
+                f.write(b'\0' * ((-f.tell()) % ALIGNMENT))
+        os.replace(temporary, self.filename)
+        self._discard()
+
+    def _discard(self):
+        for spill in self._files.values():
+            spill.close()
+
+
+def pack(filenames: Iterable[str | Path | Source], pack_file: str | Path, jobs: int = 1) -> int:
+    """Parses the PAGE XML files (paths or sources of blatt.sources.iter_sources) in a pool of jobs processes and
+    writes them in order into pack_file. Returns the number of Pages."""
+    from .parallel import imap
+    sources = (f.as_posix() if isinstance(f, Path) else f for f in filenames)
+    with PackWriter(pack_file) as writer:
+        for filename, text_lines, arrays in imap(_page_arrays, sources, jobs):
+            writer.add_arrays(filename, text_lines, arrays)
+    return len(writer.filenames)
+
+
+class PackedCorpus(Corpus):
+    """
+    Class PackedCorpus: A Corpus read from a packed corpus file (see `blatt pack`). The file is memory-mapped, so
+    opening it only reads the header, and only the Pages accessed are read from the disk. The Baseline and Coords
+    points of a Page are views into the file. The Pages are created with Page.from_arrays and behave like streamed
+    Pages. Use it as a context manager or call close() to unmap the file.
+    """
+    def __init__(self, filename: str | Path, sentence_splitter: str | SentenceSplitter = 'segtok'):
+        self.filename: Path = Path(filename)
+        self.streaming: bool = True
+        self.sentence_splitter: SentenceSplitter = get_splitter(sentence_splitter)
+        with open(self.filename, 'rb') as f:
+            self._mmap: mmap.mmap | None = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, start = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f'File "{filename}" is not a packed blatt corpus.')
+        if version != VERSION:
+            self.close()
+            raise ValueError(f'Packed corpus version {version} is not supported (expected {VERSION}).')
+        header = json.loads(bytes(self._mmap[HEADER.size:start]).rstrip(b'\0'))
+        self.filenames: List[Path] = [Path(name) for name in header['filenames']]
+        self._arrays: Dict[str, np.ndarray] = {
+            name: np.frombuffer(self._mmap, dtype=spec['dtype'], count=int(np.prod(spec['shape'])),
+                                offset=start + spec['offset']).reshape(spec['shape'])
+            for name, spec in header['arrays'].items()}
+
+    def __repr__(self):
+        return f'PackedCorpus({self.filename.as_posix()!r}, {len(self.filenames)} pages)'
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Unmaps the file, e.g. to replace or delete it (on Windows, a mapped file cannot be). The Baseline and Coords
+        points of Pages still in use are views into the file, it is unmapped when the last of them is released."""
+        if self._mmap is None:
+            return
+        self._arrays = {}
+        try:
+            self._mmap.close()
+        except BufferError:  # views of Pages still in use
+            pass
+        self._mmap = None
+
+    def __getitem__(self, i: int) -> Page:
+        return self.page(i)
+
+    def page(self, i: int) -> Page:
+        """Returns the i-th Page."""
+        if self._mmap is None:
+            raise ValueError('The packed corpus is closed.')
+        if i < 0:
+            i += len(self.filenames)
+        if not 0 <= i < len(self.filenames):
+            raise IndexError('Page index out of range.')
+        a = self._arrays
+        e0, e1 = a['page_entries'][i:i + 2].tolist()
+        t0, t1 = a['page_text_lines'][i:i + 2].tolist()
+        text_offsets = a['text_offsets'][e0:e1 + 1].tolist()
+        text = a['text'][text_offsets[0]:text_offsets[-1]].tobytes()
+        base = text_offsets[0]
+        text_lines = [text[start - base:end - base].decode('utf-8')
+                      for start, end in zip(text_offsets[:-1], text_offsets[1:])]
+        id_offsets = a['line_id_offsets'][t0:t1 + 1].tolist()
+        ids = a['line_ids'][id_offsets[0]:id_offsets[-1]].tobytes()
+        base = id_offsets[0]
+        line_ids = [ids[start - base:end - base].decode('utf-8') for start, end in zip(id_offsets[:-1], id_offsets[1:])]
+        arrays = {'line_ids': line_ids,
+                  'line_region_ids': a['line_region_ids'][t0:t1],
+                  'text_line_index': a['text_line_index'][e0:e1] - t0}
+        for name in ('baseline', 'coords'):
+            offsets = a[name + '_offsets'][t0:t1 + 1]
+            arrays[name + '_points'] = a[name + '_points'][offsets[0]:offsets[-1]]
+            arrays[name + '_offsets'] = offsets - offsets[0]
+        return Page.from_arrays(self.filenames[i], text_lines, arrays, self.sentence_splitter)
+
+    def pages(self) -> Iterator[Page]:
+        """Yields the Pages in order."""
+        for i in range(len(self.filenames)):
+            yield self.page(i)
@@ -1,9 +1,17 @@
 from lxml import etree as ET
 from pprint import pformat
-from typing import List, Tuple
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Tuple
 from pathlib import Path
-from segtok.segmenter import split_multi
+from functools import cached_property
+from contextlib import contextmanager, nullcontext
+import numpy as np
+import io
+import gzip
 import csv
+import sys
+from .profile import Profile
+from .sentences import SentenceSplitter, get_splitter
+from .spatial import LineIndex
 
 
 class Page:
@@ -11,31 +19,158 @@ class Page:
     Class Page: Reads PAGE XML file. Stores TextRegions, TextLines and Baseline coordinates.
     Removes hyphens from the text lines. Computes the coordinates of the mid-range average of baseline points.
     Saves plain text with or without line breaks to TXT file. Splits plain text into sentences and saves it as TSV.
+    If streaming==True, the PAGE XML file is parsed in a single pass with lxml.etree.iterparse and the XML tree is not
+    kept (no tree, root, text_regions_xml and text_lines_xml attributes). This bounds the memory for very large pages
+    (e.g. with Words and Glyphs), it is not faster than parsing the tree.
+    If a Profile is given, the wall time per processing stage and counters are recorded in it.
+    Instead of a filename, the content of a PAGE XML file as bytes or a binary file object (e.g. sys.stdin.buffer) can
+    be passed. Files ending with .gz and gzip-compressed bytes or file objects are decompressed.
+    The sentences are split with the sentence_splitter, a name of blatt.sentences.SPLITTERS ('segtok' [default] or
+    'rules') or a SentenceSplitter.
     """
-    def __init__(self, filename: str | Path = ''):
+    def __init__(self, filename: str | Path | bytes | BinaryIO = '', streaming: bool = False,
+                 profile: Profile | None = None, sentence_splitter: str | SentenceSplitter = 'segtok'):
         if filename:
-            self.filename: Path = self._validate_filename(filename)
-            self.tree, self.root, self.namespace = self._open_page_xml(filename)
-            self.text_regions: List
-            self.text_regions_xml = [e for e in self.root.iter("{%s}TextRegion" % self.namespace)]
-            self.text_lines: List
-            self.text_lines_xml = [e for e in self.root.iter("{%s}TextLine" % self.namespace)]
-            self._parse_page_xml()
-            self.text_with_linebreaks = '\n'.join(self.text_lines)
-            self.text_without_linebreaks = self.remove_hyphens(self.text_lines)
-            self.sentences = self.split_sentences(self.text_without_linebreaks)
-            self.baselines: List
-            self.x_baselines: List
-            self.y_baselines: List
-            self.center_baseline: List
-            self._compute_baselines()
-            self.attribute_length = [
-                (k, len(v)) for k, v in self.__dict__.items()
-                if k != 'tree' and hasattr(v, '__len__')
-            ]
+            self.profile: Profile | None = profile
+            self.sentence_splitter: SentenceSplitter = get_splitter(sentence_splitter)
+            if isinstance(filename, (bytes, bytearray)):
+                self.filename: Path = Path('<bytes>')
+                source = self._decompress(io.BytesIO(filename))
+            elif hasattr(filename, 'read'):
+                name = getattr(filename, 'name', None)
+                self.filename: Path = Path(name if isinstance(name, str) and name else '<stream>')
+                source = self._decompress(filename if filename.seekable() else io.BytesIO(filename.read()))
+            else:
+                self.filename: Path = self._validate_filename(filename)
+                source = self.filename
+                if self.filename.suffix == '.gz':
+                    with gzip.open(self.filename) as f:
+                        source = io.BytesIO(f.read())
+            self.text_lines: List[str]
+            if streaming:
+                self.namespace: str = ''
+                self._parse_page_xml(self._iterparse_page_xml(source))
+            else:
+                with self._stage('parse'):
+                    self.tree, self.root, self.namespace = self._open_page_xml(source)
+                    self.text_regions_xml = [e for e in self.root.iter("{%s}TextRegion" % self.namespace)]
+                    self.text_lines_xml = [e for e in self.root.iter("{%s}TextLine" % self.namespace)]
+                self._parse_page_xml(self._iter_page_xml())
         else:
             raise ValueError('Empty filename. Specify the proper filename of a PAGE XML file.')
 
+    @classmethod
+    async def aload(cls, filename: str | Path, streaming: bool = True, executor=None,
+                    sentences: bool = False) -> 'Page':
+        """Loads a Page in asyncio code without blocking the event loop: `page = await Page.aload(PAGEXML)`. See
+        blatt.aio.aload."""
+        from .aio import aload
+        return await aload(filename, streaming, executor, sentences)
+
+    @property
+    def attribute_length(self) -> List[Tuple[str, int]]:
+        """Lengths of the attributes computed so far. The lazy attributes appear after their first access."""
+        return [
+            (k, len(v)) for k, v in self.__dict__.items()
+            if k != 'tree' and hasattr(v, '__len__')
+        ]
+
+    def _stage(self, name: str):
+        """Returns a context manager timing the stage name if profiling is on, otherwise a no-op."""
+        if self.profile is None:
+            return nullcontext()
+        return self.profile.stage(name)
+
+    def _count(self, name: str, n: int = 1):
+        if self.profile is not None:
+            self.profile.count(name, n)
+
+    @cached_property
+    def text_with_linebreaks(self) -> str:
+        """Plain text with TextLines separated by line breaks. Computed on first access."""
+        return '\n'.join(self.text_lines)
+
+    @cached_property
+    def text_without_linebreaks(self) -> str:
+        """Plain text without line breaks and hyphens. Computed on first access."""
+        with self._stage('remove_hyphens'):
+            return self.remove_hyphens(self.text_lines)
+
+    @cached_property
+    def sentences(self) -> List[str]:
+        """Sentences split from text_without_linebreaks. Computed on first access."""
+        text = self.text_without_linebreaks
+        with self._stage('split_sentences'):
+            return self.sentence_splitter.split(text)
+
+    @cached_property
+    def text_offsets(self) -> np.ndarray:
+        """Start and end offsets of the entries of text_lines in text_without_linebreaks (see line_offsets). Computed on
+        first access."""
+        with self._stage('offsets'):
+            return self.line_offsets(self.text_lines)
+
+    @cached_property
+    def sentence_spans(self) -> np.ndarray:
+        """Start and end offsets of the sentences in text_without_linebreaks as an array of shape (len(sentences), 2).
+        Computed on first access."""
+        text = self.text_without_linebreaks
+        spans = np.empty((len(self.sentences), 2), dtype=np.int64)
+        position = 0
+        with self._stage('offsets'):
+            for i, sentence in enumerate(self.sentences):
+                start = text.find(sentence, position)
+                if start < 0:  # a splitter changed the sentence: fall back to its expected position
+                    start = min(position, len(text))
+                position = start + len(sentence)
+                spans[i] = start, min(position, len(text))
+        return spans
+
+    def lines_in_span(self, start: int, end: int) -> np.ndarray:
+        """Returns the indices of the entries of text_lines overlapping the characters start:end of
+        text_without_linebreaks, found by binary search in text_offsets. Use text_line_index to get their TextLines,
+        e.g. line_ids, line_region_ids and the Baseline points."""
+        offsets = self.text_offsets
+        first = np.searchsorted(offsets[:, 1], start, side='right')
+        last = np.searchsorted(offsets[:, 0], end, side='left')
+        candidates = np.arange(first, max(first, last))
+        return candidates[offsets[candidates, 1] > offsets[candidates, 0]]
+
+    def _span_text_lines(self, start: int, end: int) -> List[int]:
+        """Returns the indices of the TextLines overlapping the characters start:end of text_without_linebreaks."""
+        return list(dict.fromkeys(self.text_line_index[self.lines_in_span(start, end)].tolist()))
+
+    def sentence_lines(self) -> List[List]:
+        """List of [sentence, TextRegionIDs, TextLineIDs, Baseline coordinates] per sentence with the TextLines the
+        sentence was taken from."""
+        rows = []
+        for sentence, (start, end) in zip(self.sentences, self.sentence_spans.tolist()):
+            text_lines = self._span_text_lines(start, end)
+            rows.append([sentence,
+                         [int(self.line_region_ids[i]) for i in text_lines],
+                         [self.line_ids[i] for i in text_lines],
+                         [self.baseline_points[self.baseline_offsets[i]:self.baseline_offsets[i + 1]].tolist()
+                          for i in text_lines]])
+        return rows
+
+    @cached_property
+    def x_baselines(self) -> np.ndarray:
+        """X coordinates of all baseline points. Computed on first access."""
+        self._compute_baselines()
+        return self.x_baselines
+
+    @cached_property
+    def y_baselines(self) -> np.ndarray:
+        """Y coordinates of all baseline points. Computed on first access."""
+        self._compute_baselines()
+        return self.y_baselines
+
+    @cached_property
+    def center_baseline(self) -> List:
+        """Mid-range average of baseline points. Computed on first access."""
+        self._compute_baselines()
+        return self.center_baseline
+
     def __repr__(self):
         return pformat(self.attribute_length)
 
@@ -61,91 +196,415 @@ class Page:
         return filename
 
     @staticmethod
-    def _open_page_xml(filename: Path = '') -> Tuple[ET.Element, ET._ElementTree, str]:
+    def _decompress(source: BinaryIO) -> BinaryIO:
+        """Returns the seekable file object source or, if its content is gzip-compressed (by the magic bytes), a file
+        object with the decompressed content."""
+        position = source.tell()
+        magic = source.read(2)
+        source.seek(position)
+        if magic != b'\x1f\x8b':
+            return source
+        decompressed = io.BytesIO(gzip.decompress(source.read()))
+        decompressed.name = getattr(source, 'name', None)
+        return decompressed
+
+    @staticmethod
+    def _open_page_xml(filename: Path | BinaryIO = '') -> Tuple[ET.Element, ET._ElementTree, str]:
         """Opens a PAGE XML file and returns its tree, root and namespace."""
         tree = ET.parse(filename)
         root = tree.getroot()
         namespace = tree.xpath('namespace-uri(.)')
+        Page._check_namespace(namespace)
+        return tree, root, namespace
+
+    @staticmethod
+    def _check_namespace(namespace: str):
+        """Raises ValueError if namespace is not a PAGE XML namespace."""
         if 'http://schema.primaresearch.org/PAGE/gts/pagecontent/' not in namespace:
             raise ValueError('The PAGE XML namespace is missing in the xml-file.')
-        return tree, root, namespace
 
-    def _parse_page_xml(self):
-        """Parses TextRegions, TextLines and Baselines. Adds them to the corresponding attributes."""
-        self.text_regions, self.text_lines, self.baselines = [], [], []
+    def _warn_missing_baseline(self, text_line_id: str):
+        self._count('missing_baselines')
+        print('Warning! No "Baseline points" for "TextLine id"=' +
+              text_line_id + ' in "file"=' + Path(self.filename).name, file=sys.stderr)
+
+    def _read_text_line(self, text_line: ET.Element,
+                        baseline_points: str | None) -> Tuple[str, str | None, str, List[str]]:
+        """Reads TextLineID, Baseline points, Coords points and Unicode texts of a TextLine element. If the Baseline
+        is missing, the baseline_points of the previous TextLine are reused."""
+        text_line_id = text_line.attrib['id']
+        baseline = text_line.find('{%s}Baseline' % self.namespace)
+        if baseline is not None and 'points' in baseline.attrib:
+            baseline_points = baseline.attrib['points']
+        else:
+            self._warn_missing_baseline(text_line_id)
+        coords = text_line.find('{%s}Coords' % self.namespace)
+        coords_points = coords.attrib.get('points', '') if coords is not None else ''
+        lines = []
+        for text_equiv in text_line.iterchildren('{%s}TextEquiv' % self.namespace):
+            unicode = text_equiv.find('{%s}Unicode' % self.namespace)
+            if unicode is not None:
+                lines.append(unicode.text or '')
+            if unicode is None or not unicode.text:
+                self._count('empty_text_equivs')
+        return text_line_id, baseline_points, coords_points, lines
+
+    def _iter_page_xml(self) -> Iterator[Tuple[int, str, str, str, List[str]]]:
+        """Walks the parsed tree and yields (TextRegionID, TextLineID, Baseline points, Coords points, Unicode texts)
+        for each TextLine."""
+        baseline_points = ''
         for text_region_id, text_region in enumerate(self.root.iter('{%s}TextRegion' % self.namespace)):
             for text_line in text_region.findall('{%s}TextLine' % self.namespace):
-                text_line_id = text_line.attrib['id']
-                try:
-                    text_line_bs = text_line.find('{%s}Baseline' % self.namespace).attrib['points']
-                except (Exception,):
-                    print('Warning! No "Baseline points" for "TextLine id"=' +
-                          text_line_id + ' in "file"=' + Path(self.filename).name)
-                coordinates = [c.split(',') for c in text_line_bs.split(' ')]
-                coordinates = [[int(c[0]), int(c[1])] for c in coordinates]
-                self.baselines.extend(coordinates)
-                for text_equiv in text_line.findall('{%s}TextEquiv' % self.namespace):
-                    try:
-                        line = text_equiv.find('{%s}Unicode' % self.namespace).text
-                        if not line:
-                            line = ''
-                        self.text_regions.append([line, text_region_id, text_line_id, coordinates])
-                        self.text_lines.append(line)
-                    except (Exception,):
-                        pass
+                text_line_id, baseline_points, coords_points, lines = self._read_text_line(text_line, baseline_points)
+                yield text_region_id, text_line_id, baseline_points, coords_points, lines
+
+    @staticmethod
+    @contextmanager
+    def _open_source(source: Path | BinaryIO) -> Iterator[BinaryIO]:
+        """Opens a path or rewinds a seekable file object for reading from the start."""
+        if isinstance(source, Path):
+            with open(source, 'rb') as f:
+                yield f
+        else:
+            source.seek(0)
+            yield source
+
+    def _iterparse_page_xml(self, source: Path | BinaryIO) -> Iterator[Tuple[int, str, str, str, List[str]]]:
+        """Streams the PAGE XML file with lxml.etree.iterparse and yields the same tuples as _iter_page_xml in a
+        single pass. Elements are cleared as soon as they are consumed, so the memory does not depend on the size of
+        the document (e.g. on the number of Words and Glyphs). The namespace is taken from the root element at the
+        first event. As in _iter_page_xml, a TextLine without Baseline reuses the Baseline points of the TextLine
+        yielded before it."""
+        # The tree walk yields the TextLines grouped by TextRegion in the order the TextRegions start. Nested
+        # TextRegions end before their parents, so the TextLines are buffered until all preceding TextRegions are
+        # closed.
+        open_regions, buffers, closed = [], {}, set()
+        text_region_count, next_region, baseline_points = 0, 0, ''
+        text_region_tag = text_line_tag = None
+        with self._open_source(source) as f:
+            events = ET.iterparse(f, events=('start', 'end'),
+                                  tag=('{*}PcGts', '{*}TextRegion', '{*}TextLine', '{*}Word'))
+            for event, element in events:
+                if text_region_tag is None:
+                    text_region_tag, text_line_tag = self._set_namespace(element.getroottree().getroot())
+                if event == 'start':
+                    if element.tag == text_region_tag:
+                        open_regions.append(text_region_count)
+                        buffers[text_region_count] = []
+                        text_region_count += 1
+                    continue
+                if element.tag == text_line_tag:
+                    if element.getparent().tag == text_region_tag:
+                        # None for a missing Baseline, replaced in the order the TextLines are yielded
+                        text_line_id, points, coords_points, lines = self._read_text_line(element, None)
+                        region = open_regions[-1]
+                        buffers[region].append((region, text_line_id, points, coords_points, lines))
+                    self._clear_element(element)
+                elif element.tag == text_region_tag:
+                    closed.add(open_regions.pop())
+                    while next_region in closed:
+                        closed.remove(next_region)
+                        for region, text_line_id, points, coords_points, lines in buffers.pop(next_region):
+                            baseline_points = baseline_points if points is None else points
+                            yield region, text_line_id, baseline_points, coords_points, lines
+                        next_region += 1
+                    self._clear_element(element)
+                else:
+                    element.clear(keep_tail=True)
+            if text_region_tag is None:  # no PcGts, TextRegion, TextLine or Word element
+                self._set_namespace(events.root)
+
+    def _set_namespace(self, root: ET.Element) -> Tuple[str, str]:
+        """Sets and checks the namespace of the root element of a streamed document. Returns the tags of the TextRegion
+        and TextLine elements."""
+        self.namespace = ET.QName(root).namespace or ''
+        self._check_namespace(self.namespace)
+        return '{%s}TextRegion' % self.namespace, '{%s}TextLine' % self.namespace
+
+    @staticmethod
+    def _clear_element(element: ET.Element):
+        """Clears a consumed element and drops its already consumed preceding siblings."""
+        element.clear(keep_tail=True)
+        while element.getprevious() is not None:
+            del element.getparent()[0]
+
+    @staticmethod
+    def parse_points(points: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Converts PAGE XML points strings 'x1,y1 x2,y2 ...' in bulk. Returns an (N, 2) int32 array with the points
+        of all strings and an int64 array of len(points) + 1 offsets: the points of points[i] are
+        array[offsets[i]:offsets[i + 1]]."""
+        counts = np.fromiter((p.count(',') for p in points), dtype=np.int64, count=len(points))
+        offsets = np.zeros(len(points) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        if not offsets[-1]:
+            return np.empty((0, 2), dtype=np.int32), offsets
+        values = np.fromstring(' '.join(p for p in points if p).replace(',', ' '), dtype=np.int32, sep=' ')
+        if values.size != 2 * offsets[-1]:
+            raise ValueError('Malformed "points" attribute in the PAGE XML file.')
+        return values.reshape(-1, 2), offsets
+
+    @staticmethod
+    def _bboxes(points: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+        """Computes (x_min, y_min, x_max, y_max) per segment of points defined by offsets. Segments without points
+        get -1 values."""
+        bboxes = np.full((len(offsets) - 1, 4), -1, dtype=np.int32)
+        non_empty = offsets[1:] > offsets[:-1]
+        if points.size:
+            starts = offsets[:-1][non_empty]
+            bboxes[non_empty, :2] = np.minimum.reduceat(points, starts, axis=0)
+            bboxes[non_empty, 2:] = np.maximum.reduceat(points, starts, axis=0)
+        return bboxes
+
+    def _parse_page_xml(self, text_lines: Iterable[Tuple[int, str, str, str, List[str]]]):
+        """Parses TextRegions, TextLines, Baselines and Coords. Adds them to the corresponding attributes. The
+        geometry is stored per TextLine as contiguous arrays of points with offsets."""
+        self.text_lines, self.line_ids, region_ids, text_line_index = [], [], [], []
+        baseline_points, coords_points = [], []
+        with self._stage('parse'):
+            for text_region_id, text_line_id, baseline, coords, lines in text_lines:
+                region_ids.append(text_region_id)
+                baseline_points.append(baseline)
+                coords_points.append(coords)
+                for line in lines:
+                    self.text_lines.append(line)
+                    text_line_index.append(len(self.line_ids))
+                self.line_ids.append(text_line_id)
         if all(line is None for line in self.text_lines):
             raise ValueError("The PAGE XML file contains only empty TextLines.")
+        with self._stage('coordinates'):
+            self.line_region_ids = np.array(region_ids, dtype=np.int32)
+            self.text_line_index = np.array(text_line_index, dtype=np.int64)
+            self.baseline_points, self.baseline_offsets = self.parse_points(baseline_points)
+            self.coords_points, self.coords_offsets = self.parse_points(coords_points)
+        if self.profile is not None:
+            self._count('text_regions', len(set(region_ids)))
+            self._count('text_lines', len(self.line_ids))
+            self._count('lines', len(self.text_lines))
+            self._count('points', len(self.baseline_points) + len(self.coords_points))
+
+    @cached_property
+    def text_regions(self) -> List[List]:
+        """List of [TextLine, TextRegionID, TextLineID, Baseline coordinates] per TextLine text. Computed on first
+        access."""
+        coordinates = {}
+        text_regions = []
+        with self._stage('text_regions'):
+            for line, i in zip(self.text_lines, self.text_line_index.tolist()):
+                if i not in coordinates:
+                    start, end = self.baseline_offsets[i], self.baseline_offsets[i + 1]
+                    coordinates[i] = self.baseline_points[start:end].tolist()
+                text_regions.append([line, int(self.line_region_ids[i]), self.line_ids[i], coordinates[i]])
+        return text_regions
+
+    @cached_property
+    def baselines(self) -> List[List[int]]:
+        """All baseline points as a list of [x, y] pairs. Computed on first access. Use baseline_points for the
+        array."""
+        return self.baseline_points.tolist()
+
+    @cached_property
+    def baseline_bboxes(self) -> np.ndarray:
+        """Bounding boxes (x_min, y_min, x_max, y_max) of the Baselines per TextLine."""
+        return self._bboxes(self.baseline_points, self.baseline_offsets)
+
+    @cached_property
+    def coords_bboxes(self) -> np.ndarray:
+        """Bounding boxes (x_min, y_min, x_max, y_max) of the Coords polygons per TextLine."""
+        return self._bboxes(self.coords_points, self.coords_offsets)
+
+    @cached_property
+    def spatial_index(self) -> LineIndex:
+        """Spatial index over the Baseline bounding boxes of the TextLines for bounding box, band and neighbour
+        queries (see blatt.spatial.LineIndex). Computed on first access."""
+        with self._stage('spatial_index'):
+            return LineIndex(self.baseline_bboxes)
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """Exports the geometry of the TextLines as NumPy arrays. The points of TextLine i are
+        baseline_points[baseline_offsets[i]:baseline_offsets[i + 1]] (the same for coords_*). text_line_index maps
+        each entry of text_lines to its TextLine."""
+        return {
+            'line_ids': np.array(self.line_ids, dtype=str),
+            'line_region_ids': self.line_region_ids,
+            'baseline_points': self.baseline_points,
+            'baseline_offsets': self.baseline_offsets,
+            'baseline_bboxes': self.baseline_bboxes,
+            'coords_points': self.coords_points,
+            'coords_offsets': self.coords_offsets,
+            'coords_bboxes': self.coords_bboxes,
+            'text_line_index': self.text_line_index,
+        }
+
+    def _line_record(self, line: str, i: int) -> Dict:
+        baseline = self.baseline_points[self.baseline_offsets[i]:self.baseline_offsets[i + 1]]
+        coords = self.coords_points[self.coords_offsets[i]:self.coords_offsets[i + 1]]
+        return {'region_id': int(self.line_region_ids[i]), 'line_id': self.line_ids[i], 'text': line,
+                'baseline': baseline.tolist(), 'coords': coords.tolist()}
+
+    def records(self, level: str = 'line') -> Iterator[Dict]:
+        """
+        Yields JSON-serializable records of the page, e.g. for JSON Lines. level=='line': one record per TextLine text
+        with its TextRegionID, TextLineID, Baseline and Coords points. level=='page': one record with the plain text
+        without hyphens and the line records. level=='sentence': one record per sentence with its offsets in the plain
+        text and the TextRegionIDs, TextLineIDs, Baseline and Coords points of the TextLines it was taken from. Every
+        record has the key 'file'.
+        """
+        file = self.filename.as_posix()
+        if level == 'line':
+            for line, i in zip(self.text_lines, self.text_line_index.tolist()):
+                yield {'file': file, **self._line_record(line, i)}
+        elif level == 'page':
+            yield {'file': file, 'text': self.text_without_linebreaks,
+                   'lines': [self._line_record(line, i) for line, i in zip(self.text_lines,
+                                                                           self.text_line_index.tolist())]}
+        elif level == 'sentence':
+            baseline_points, baseline_offsets = self.baseline_points, self.baseline_offsets
+            coords_points, coords_offsets = self.coords_points, self.coords_offsets
+            for i, (sentence, (start, end)) in enumerate(zip(self.sentences, self.sentence_spans.tolist())):
+                text_lines = self._span_text_lines(start, end)
+                yield {'file': file, 'sentence': i, 'text': sentence, 'start': start, 'end': end,
+                       'region_ids': [int(self.line_region_ids[j]) for j in text_lines],
+                       'line_ids': [self.line_ids[j] for j in text_lines],
+                       'baselines': [baseline_points[baseline_offsets[j]:baseline_offsets[j + 1]].tolist()
+                                     for j in text_lines],
+                       'coords': [coords_points[coords_offsets[j]:coords_offsets[j + 1]].tolist() for j in text_lines]}
+        else:
+            raise ValueError("The level must be 'page', 'line' or 'sentence', not %r." % level)
+
+    @classmethod
+    def from_arrays(cls, filename: str | Path, text_lines: List[str], arrays: Dict[str, np.ndarray],
+                    sentence_splitter: str | SentenceSplitter = 'segtok') -> 'Page':
+        """Creates a Page from its text_lines and the arrays of to_arrays() (the bounding boxes are optional) without
+        reading the PAGE XML file, e.g. from a packed corpus. The Page behaves like a streamed Page."""
+        page = cls.__new__(cls)
+        page.profile = None
+        page.sentence_splitter = get_splitter(sentence_splitter)
+        page.filename = Path(filename)
+        page.namespace = ''
+        page.text_lines = text_lines
+        page.line_ids = [str(line_id) for line_id in arrays['line_ids']]
+        for name in ('line_region_ids', 'text_line_index', 'baseline_points', 'baseline_offsets', 'coords_points',
+                     'coords_offsets', 'baseline_bboxes', 'coords_bboxes'):
+            if name in arrays:
+                setattr(page, name, arrays[name])
+        return page
 
     def _compute_baselines(self):
         """Returns X & Y baseline coordinates. Computes the coordinates of the mid-range average of baseline points."""
-        self.x_baselines = [coord[0] for coord in self.baselines]
-        self.y_baselines = [coord[1] for coord in self.baselines]
-        self.center_baseline = [(max(self.x_baselines) + min(self.x_baselines)) / 2,
-                                (max(self.y_baselines) + min(self.y_baselines)) / 2]
+        self.x_baselines = self.baseline_points[:, 0]
+        self.y_baselines = self.baseline_points[:, 1]
+        minimum, maximum = self.baseline_points.min(axis=0), self.baseline_points.max(axis=0)
+        self.center_baseline = ((maximum + minimum) / 2).tolist()
 
     @staticmethod
-    def remove_hyphens(lines: list) -> str:
+    def _dehyphenation_steps(lines: Iterable[str]) -> Iterator[Tuple[int, bool, str, str]]:
         """
-        Removes hyphens from OCR-ed lines stored in a list. Returns plain text.
-        The hyphens are taken from the OCR-D guidelines for hyphenation:
-        https://ocr-d.de/en/gt-guidelines/trans/trSilbentrennung.html.
+        Applies the hyphenation rules of remove_hyphens to a stream of lines. Yields (index, trim, separator, line) for
+        each line appended to the text: if trim==True, the last character (the hyphen) is removed from the text
+        before separator + line is appended. Lines not appended to the text yield nothing.
         """
         hyphens = ['-', '-', '⹀', '⸗']
-        text = lines[0]
-        for i, line in enumerate(lines[:-1]):
+        lines = iter(lines)
+        line = next(lines, None)
+        if line is None:
+            return
+        yield 0, False, '', line
+        for i, next_line in enumerate(lines, 1):
             if line:  # only for non-empty strings
                 if line[-1] in hyphens:
-                    if lines[i + 1]:
-                        if lines[i + 1][0].isupper():
-                            text += lines[i + 1]
-                        else:
-                            text = text[:-1] + lines[i + 1]
+                    if next_line:
+                        yield i, not next_line[0].isupper(), '', next_line
                 else:
-                    text += ' ' + lines[i + 1]
-        return text
+                    yield i, False, ' ', next_line
+            line = next_line
+
+    @staticmethod
+    def line_offsets(lines: Iterable[str]) -> np.ndarray:
+        """
+        Returns the offset map of remove_hyphens(lines): the start and end character offsets of every line in the
+        plain text as an array of shape (len(lines), 2). The end excludes a removed hyphen, lines not appended to the
+        text get an empty span. The starts and ends are sorted, so spans of the text can be mapped back to the lines
+        by binary search (see lines_in_span).
+        """
+        lines = list(lines)
+        starts, ends = [], []
+        length = 0
+        for index, trim, separator, line in Page._dehyphenation_steps(lines):
+            if trim:  # the last character of the text is removed
+                length = max(length - 1, 0)
+                j = len(ends) - 1
+                while j >= 0 and ends[j] > length:
+                    starts[j], ends[j] = min(starts[j], length), length
+                    j -= 1
+            while len(starts) < index:  # lines not appended to the text
+                starts.append(length)
+                ends.append(length)
+            start = length + len(separator)
+            length = start + len(line)
+            starts.append(start)
+            ends.append(length)
+        while len(starts) < len(lines):
+            starts.append(length)
+            ends.append(length)
+        offsets = np.empty((len(lines), 2), dtype=np.int64)
+        offsets[:, 0], offsets[:, 1] = starts, ends
+        return offsets
+
+    @staticmethod
+    def iter_remove_hyphens(lines: Iterable[str]) -> Iterator[str]:
+        """
+        Removes hyphens from a stream of OCR-ed lines (e.g. all lines of a book) and yields the plain text in chunks.
+        The text is the same as remove_hyphens(list(lines)), but the lines are never materialized: only the last
+        chunk is held back, because its trailing hyphen may be removed by the next line.
+        """
+        tail = ''
+        for _, trim, separator, line in Page._dehyphenation_steps(lines):
+            if trim:
+                tail = tail[:-1]
+            piece = separator + line
+            if piece:
+                if tail:
+                    yield tail
+                tail = piece
+        if tail:
+            yield tail
+
+    @staticmethod
+    def remove_hyphens(lines: Iterable[str]) -> str:
+        """
+        Removes hyphens from OCR-ed lines stored in a list. Returns plain text.
+        The hyphens are taken from the OCR-D guidelines for hyphenation:
+        https://ocr-d.de/en/gt-guidelines/trans/trSilbentrennung.html.
+        The text is joined once from its parts, so the runtime is linear in the length of the text.
+        """
+        return ''.join(Page.iter_remove_hyphens(lines))
 
     @staticmethod
     def split_sentences(text: str) -> List[str]:
-        """Splits input plain text into sentences using the SegTok library https://github.com/fnl/segtok"""
-        return list(split_multi(text))
+        """Splits input plain text into sentences using the SegTok library https://github.com/fnl/segtok. See
+        blatt.sentences for other sentence splitters."""
+        return get_splitter('segtok').split(text)
 
     def to_txt(self, filename: Path, linebreak: bool = False):
         """Saves TextLines as plain text into filename. If linebreak==True, the lines are separated by line breaks.
         Otherwise, the plain text contains no line breaks and hyphens [this is default]."""
-        with open(filename, 'w') as f:
-            if linebreak:
-                f.write(self.text_with_linebreaks)
-            else:
-                f.write(self.text_without_linebreaks)
+        text = self.text_with_linebreaks if linebreak else self.text_without_linebreaks
+        with self._stage('write'), open(filename, 'w') as f:
+            f.write(text)
 
-    def to_tsv(self, filename: Path, sentence: bool = False):
+    def to_tsv(self, filename: Path, sentence: bool = False, lines: bool = False):
         """If sentence==False [default], it saves TextLines, TextRegionID, TextLineID and Coordinates to TSV.
         Otherwise, it saves sentences (not lines!) into separate lines of TSV. The sentences are split from the plain
-        text without hyphens using the SegTok library. """
-        with open(filename, 'w', newline='') as f:
-            if sentence:
+        text without hyphens using the SegTok library. If lines==True, the sentences are saved with the
+        TextRegionIDs, TextLineIDs and Baseline coordinates of their TextLines (see sentence_lines). """
+        if sentence and lines:
+            rows = self.sentence_lines()
+        else:
+            rows = self.sentences if sentence else self.text_regions
+        with self._stage('write'), open(filename, 'w', newline='') as f:
+            if sentence and not lines:
                 tsv = csv.writer(f, delimiter="\n")
-                tsv.writerow(self.sentences)
+                tsv.writerow(rows)
             else:
                 tsv = csv.writer(f, delimiter='\t')
-                tsv.writerows(self.text_regions)
+                tsv.writerows(rows)
@@ -0,0 +1,57 @@
+from collections import deque
+from contextlib import contextmanager
+from itertools import chain, islice
+from typing import Callable, Iterable, Iterator, TypeVar
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+
+class WorkerError(Exception):
+    """Error in a worker, raised with the name of the item (e.g. the file) that failed. Unlike many errors (e.g.
+    lxml's XMLSyntaxError with its error log), it can be pickled back from a worker process."""
+
+
+@contextmanager
+def worker_errors(name: str) -> Iterator[None]:
+    """Re-raises the errors in the block as WorkerError with name, e.g. in a worker function of imap."""
+    try:
+        yield
+    except Exception as error:
+        raise WorkerError(f'{name}: {error}') from error
+
+
+def clamp_jobs(jobs: int, total: int | None) -> int:
+    """Returns the number of processes for total items (None if unknown): at most one per item, at least one."""
+    return jobs if total is None else max(1, min(jobs, total))
+
+
+def imap(function: Callable[[T], R], items: Iterable[T], jobs: int = 1, window: int | None = None) -> Iterator[R]:
+    """
+    Applies function to items in a pool of jobs processes and yields the results in the order of items as soon as
+    they are ready. Unlike Executor.map, items are consumed lazily and at most window (default 4 * jobs) tasks are
+    submitted at a time, so the memory is bounded for endless inputs such as paths read from stdin. The first jobs
+    items are read before the pool is started: with fewer items, only as many processes are started. With one item
+    or jobs==1, the function runs in the current process without a pool. function must be picklable (module-level)
+    and so must its results and errors (see worker_errors).
+    """
+    items = iter(items)
+    head = list(islice(items, jobs))
+    jobs = clamp_jobs(jobs, len(head))
+    items = chain(head, items)
+    if jobs == 1:
+        yield from map(function, items)
+        return
+    from concurrent.futures import ProcessPoolExecutor
+    window = window or 4 * jobs
+    executor = ProcessPoolExecutor(max_workers=jobs)
+    pending = deque()
+    try:
+        for item in items:
+            pending.append(executor.submit(function, item))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,60 @@
+from collections import defaultdict
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Dict, Iterable, List
+
+
+class Profile:
+    """
+    Class Profile: Records the wall time per processing stage (e.g. 'parse', 'coordinates', 'remove_hyphens',
+    'split_sentences', 'write') and counters (e.g. TextLines, points, missing Baselines) of a Page.
+    Pass it as Page(filename, profile=Profile()). Without a profile, the Page records nothing.
+    """
+    def __init__(self, name: str = ''):
+        self.name: str = name
+        self.times: Dict[str, float] = defaultdict(float)
+        self.counters: Dict[str, int] = defaultdict(int)
+
+    def __repr__(self):
+        return f'Profile({self.name!r}, times={dict(self.times)}, counters={dict(self.counters)})'
+
+    @contextmanager
+    def stage(self, name: str):
+        """Context manager adding the wall time of its block to the stage name."""
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.times[name] += perf_counter() - start
+
+    def count(self, name: str, n: int = 1):
+        """Adds n to the counter name."""
+        self.counters[name] += n
+
+    def to_dict(self) -> Dict:
+        """Returns name, total seconds, seconds per stage and counters as a JSON-serializable dict."""
+        return {'name': self.name,
+                'seconds': sum(self.times.values()),
+                'stages': dict(self.times),
+                'counters': dict(self.counters)}
+
+    @staticmethod
+    def summary(profiles: Iterable[Dict], top: int = 10) -> Dict:
+        """Aggregates the dicts of Profile.to_dict() of many files. Returns the number of files, total seconds, seconds
+        and share per stage, summed counters and the top slowest files."""
+        profiles = list(profiles)
+        stages: Dict[str, float] = defaultdict(float)
+        counters: Dict[str, int] = defaultdict(int)
+        for profile in profiles:
+            for k, v in profile['stages'].items():
+                stages[k] += v
+            for k, v in profile['counters'].items():
+                counters[k] += v
+        total = sum(stages.values())
+        slowest: List[Dict] = sorted(profiles, key=lambda p: p['seconds'], reverse=True)[:top]
+        return {'files': len(profiles),
+                'seconds': total,
+                'stages': {k: {'seconds': v, 'share': v / total if total else 0.0}
+                           for k, v in sorted(stages.items(), key=lambda kv: kv[1], reverse=True)},
+                'counters': dict(counters),
+                'slowest': slowest}
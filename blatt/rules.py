@@ -0,0 +1,81 @@
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+import json
+import re
+
+
+class KeyValueRules:
+    """
+    Class KeyValueRules: Extracts key-value records from the lines of a segment, e.g. an entry of a directory like
+    'Firma X, Berlin.' 'Fernruf: 12 34 56.' 'Inhaber: Y.' The lines before the first key are the name of the record,
+    a line 'Key: value' starts a property and the following lines without a key continue its value. A line is a key
+    line if its text before the first ':' is not one of the exceptions (e.g. place names), contains none of the
+    excluded substrings (e.g. 'stellv.', ignoring the case) and, unless allow_digits, no digits. Keys in not_first
+    (e.g. 'Inhaber') are part of the name if they occur in the first key line. The replacements (e.g. {'::': ':'})
+    are applied to every line first. A record without keys is a cross-reference if a line matches the regular
+    expression reference (e.g. 'siehe '), the text after it is the value of reference_key. Otherwise its whole text is
+    the value of unmatched_key (no property if empty).
+    The exceptions are a hashed set, the other conditions are compiled into one regular expression, and every line
+    is split once. The rules of a book are loaded from a JSON config file (see load), so that a new book needs a
+    config file, not a new script.
+    """
+    def __init__(self, exceptions: Iterable[str] = (), excluded: Iterable[str] = (), allow_digits: bool = False,
+                 not_first: Iterable[str] = (), replacements: Dict[str, str] | None = None, reference: str = '',
+                 reference_key: str = '', unmatched_key: str = ''):
+        self.exceptions: frozenset = frozenset(exceptions)
+        self.excluded: List[str] = list(excluded)
+        self.allow_digits: bool = allow_digits
+        self.not_first: frozenset = frozenset(not_first)
+        self.replacements: Dict[str, str] = dict(replacements or {})
+        self.reference: re.Pattern | None = re.compile(reference) if reference else None
+        self.reference_key: str = reference_key
+        self.unmatched_key: str = unmatched_key
+        invalid = ([] if allow_digits else [r'\d']) + [re.escape(substring) for substring in self.excluded]
+        self._invalid: re.Pattern | None = re.compile('|'.join(invalid), re.IGNORECASE) if invalid else None
+
+    def __repr__(self):
+        return f'KeyValueRules({len(self.exceptions)} exceptions, {len(self.excluded)} excluded substrings)'
+
+    @classmethod
+    def load(cls, filename: str | Path) -> 'KeyValueRules':
+        """Loads the rules from a JSON file with an object of the arguments of KeyValueRules, e.g.
+        {"exceptions": ["", "Nürnberg"], "excluded": ["stellv."], "not_first": ["Inhaber"]}."""
+        with open(filename, encoding='utf-8') as f:
+            return cls(**json.load(f))
+
+    def is_key(self, key: str) -> bool:
+        """Checks whether key (the text before ':') is a key."""
+        return key not in self.exceptions and not (self._invalid and self._invalid.search(key))
+
+    def extract(self, lines: Iterable[str]) -> Tuple[str, List[Tuple[str, str]]]:
+        """Returns the name and the properties (key, value) of the record in lines. Empty lines are skipped."""
+        name, properties, text = [], [], []
+        first = True
+        for line in lines:
+            for old, new in self.replacements.items():
+                line = line.replace(old, new)
+            if not line:
+                continue
+            text.append(line)
+            key, colon, value = line.partition(':')
+            if colon and self.is_key(key):
+                if first and key in self.not_first:
+                    first = False
+                    name.append(line)
+                    continue
+                first = False
+                properties.append((key, [value.strip()]))
+            elif properties:
+                properties[-1][1].append(line)
+            else:
+                name.append(line)
+        if properties:
+            return ' '.join(name), [(key, ' '.join(part for part in value if part)) for key, value in properties]
+        if self.reference:
+            for i, line in enumerate(text):
+                match = self.reference.search(line)
+                if match:
+                    rest = ' '.join([line[match.end():]] + text[i + 1:])
+                    return ' '.join(text[:i]), [(self.reference_key, rest)]
+        text = ' '.join(text)
+        return text, [(self.unmatched_key, text)] if self.unmatched_key else []
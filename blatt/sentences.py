@@ -0,0 +1,122 @@
+from typing import Dict, Iterable, List, Tuple
+import abc
+import re
+
+
+class SentenceSplitter(abc.ABC):
+    """
+    Class SentenceSplitter: Abstract base class of the sentence splitters. Subclasses implement split(text) (a
+    subclass without it cannot be instantiated) and are registered in SPLITTERS under their name. split_batch splits
+    many texts (e.g. the plain texts of many Pages) in a pool of worker processes.
+    """
+    name: str = ''
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}()'
+
+    @abc.abstractmethod
+    def split(self, text: str) -> List[str]:
+        """Splits plain text into sentences."""
+
+    def split_batch(self, texts: Iterable[str], jobs: int = 1, batch_size: int = 64) -> List[List[str]]:
+        """Splits each of texts into sentences. With jobs > 1, batches of batch_size texts are split in a pool of
+        jobs processes, so that the overhead per text is small. Returns the sentences per text in the order of texts."""
+        if jobs == 1:
+            return [self.split(text) for text in texts]
+        from .parallel import imap
+        texts = list(texts)
+        batches = ((self, texts[i:i + batch_size]) for i in range(0, len(texts), batch_size))
+        return [sentences for batch in imap(_split_batch, batches, jobs) for sentences in batch]
+
+
+def _split_batch(args: Tuple[SentenceSplitter, List[str]]) -> List[List[str]]:
+    """Worker: splits a batch of texts with a splitter. Module-level to be picklable."""
+    splitter, texts = args
+    return [splitter.split(text) for text in texts]
+
+
+class SegtokSplitter(SentenceSplitter):
+    """
+    Class SegtokSplitter: Splits sentences with split_multi of the SegTok library https://github.com/fnl/segtok. This
+    is the default.
+    """
+    name = 'segtok'
+
+    def split(self, text: str) -> List[str]:
+        from segtok.segmenter import split_multi  # imported on demand, only needed for sentences
+        return list(split_multi(text))
+
+
+class RuleSplitter(SentenceSplitter):
+    """
+    Class RuleSplitter: A fast rule-based sentence splitter for historical German directories and reference books.
+    Splits after '.', '!' or '?' followed by a space, unless the period ends an abbreviation (e.g. 'Str.', 'Dir.',
+    'G. m. b. H.', 'A.-G.', streets like 'Friedrichstr.', single letters and initials) or an ordinal number before a
+    month, or the next word starts in lower case. Additional abbreviations (without the period) can be given.
+    """
+    name = 'rules'
+
+    ABBREVIATIONS = frozenset((
+        'Abt', 'Akt', 'Anm', 'Apr', 'Aug', 'Bd', 'Bde', 'Bez', 'Bhf', 'Bl', 'Co', 'Dez', 'Dipl', 'Dir', 'Dr', 'Fa',
+        'Febr', 'Fr', 'Frl', 'Gebr', 'Gen', 'Ges', 'Gesch', 'Hr', 'Hrn', 'Inh', 'Ing', 'Jan', 'Jg', 'Jhrg', 'Kfm',
+        'Kaufm', 'Kom', 'Komm', 'Kr', 'Mill', 'Mio', 'Mk', 'Nachf', 'Nov', 'Nr', 'Okt', 'Pf', 'Pfg', 'Pl', 'Pr',
+        'Prof', 'Prok', 'Reg', 'Rr', 'Sept', 'St', 'Stellv', 'Str', 'Tel', 'Verw', 'Vors', 'Wwe', 'Ztr', 'abzgl',
+        'bzw', 'ca', 'eingetr', 'evtl', 'geb', 'gegr', 'ggf', 'inkl', 'jun', 'jr', 'sen', 'usw', 'verw', 'vgl',
+        'vorm', 'zus', 'zzgl',
+    ))
+    MONTHS = frozenset((
+        'Januar', 'Februar', 'März', 'April', 'Mai', 'Juni', 'Juli', 'August', 'September', 'Oktober', 'November',
+        'Dezember', 'Jan.', 'Febr.', 'Apr.', 'Aug.', 'Sept.', 'Okt.', 'Nov.', 'Dez.',
+    ))
+    # a sentence terminal with optional closing quotes or brackets, followed by whitespace and the next word
+    BOUNDARY = re.compile(r'([.!?])[")\]»«“”\']*(\s+)(?=(\S+))')
+
+    def __init__(self, abbreviations: Iterable[str] = ()):
+        self.abbreviations = self.ABBREVIATIONS | frozenset(abbreviations)
+
+    def _is_boundary(self, text: str, match: re.Match) -> bool:
+        next_word = match.group(3)
+        if next_word[0].islower():
+            return False
+        if match.group(1) != '.':
+            return True
+        start = text.rfind(' ', 0, match.start(1)) + 1
+        word = text[start:match.start(1)].lstrip('("„»«')
+        if not word:
+            return True
+        if word.isdigit():
+            return next_word not in self.MONTHS
+        return not (len(word) == 1 or '.' in word or word in self.abbreviations or word.endswith('str'))
+
+    def split(self, text: str) -> List[str]:
+        sentences, start = [], 0
+        for match in self.BOUNDARY.finditer(text):
+            if self._is_boundary(text, match):
+                sentence = text[start:match.start(2)].strip()
+                if sentence:
+                    sentences.append(sentence)
+                start = match.end(2)
+        sentence = text[start:].strip()
+        if sentence:
+            sentences.append(sentence)
+        return sentences
+
+
+SPLITTERS = {
+    'segtok': SegtokSplitter,
+    'rules': RuleSplitter,
+}
+
+_INSTANCES: Dict[str, SentenceSplitter] = {}
+
+
+def get_splitter(splitter: str | SentenceSplitter = 'segtok') -> SentenceSplitter:
+    """Returns the sentence splitter registered under the name splitter (see SPLITTERS) or splitter itself if it is a
+    SentenceSplitter."""
+    if isinstance(splitter, SentenceSplitter):
+        return splitter
+    if splitter not in SPLITTERS:
+        raise ValueError(f'Unknown sentence splitter {splitter!r}. Use one of {", ".join(SPLITTERS)}.')
+    if splitter not in _INSTANCES:
+        _INSTANCES[splitter] = SPLITTERS[splitter]()
+    return _INSTANCES[splitter]
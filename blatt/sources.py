@@ -0,0 +1,120 @@
+from fnmatch import fnmatch
+from pathlib import Path, PurePosixPath
+from typing import Any, BinaryIO, Callable, Iterable, Iterator, List, Tuple
+import gzip
+import io
+import sys
+
+# A source is the path of a PAGE XML file (str) or the name and the content of an archive member (Tuple[str, bytes]).
+# Sources are picklable, so that they can be sent to worker processes.
+Source = str | Tuple[str, bytes]
+
+ARCHIVE_SUFFIXES = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+
+
+def is_archive(path: str | Path) -> bool:
+    """Checks whether path is a zip or (compressed) tar archive by its name."""
+    return Path(path).is_file() and Path(path).name.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def _matches(name: str, pattern: str) -> bool:
+    name = PurePosixPath(name).name
+    return fnmatch(name, pattern) or fnmatch(name, pattern + '.gz')
+
+
+def _skip_compressed_copies(items: Iterable, name: Callable[[Any], str] = str, warn: bool = True) -> Iterator:
+    """Yields items, but skips a file X.xml.gz if X.xml came before and vice versa (e.g. a PAGE XML file and its
+    compressed copy in one folder), with a warning. For sorted names, the uncompressed file is kept."""
+    first = {}
+    for item in items:
+        item_name = name(item)
+        key = item_name[:-3] if item_name.lower().endswith('.gz') else item_name
+        if key in first:
+            if warn:
+                print(f'Warning! Skipping "{item_name}", "{first[key]}" has the same name.', file=sys.stderr)
+            continue
+        first[key] = item_name
+        yield item
+
+
+def _folder_files(path: Path, pattern: str, warn: bool = True) -> List[str]:
+    return list(_skip_compressed_copies(sorted(file_path.as_posix() for file_path in path.iterdir()
+                                               if file_path.is_file() and _matches(file_path.name, pattern)),
+                                        warn=warn))
+
+
+def _zip_members(archive, pattern: str, warn: bool = True) -> List[str]:
+    return list(_skip_compressed_copies(sorted(info.filename for info in archive.infolist()
+                                               if not info.is_dir() and _matches(info.filename, pattern)),
+                                        warn=warn))
+
+
+def iter_sources(path: str | Path, pattern: str = '*.xml') -> Iterator[Source]:
+    """
+    Yields the PAGE XML files matching pattern (also gzip-compressed as pattern + '.gz') of path:
+    - a folder: the paths of the files sorted by name,
+    - a zip or tar archive: the names (archive/member) and contents of the members (also in subfolders). The members
+      are read one by one without extracting them. Zip members are sorted by name, tar archives are streamed in
+      their order, so that compressed tar archives are decompressed only once,
+    - any other file: its path.
+    If a file is found both uncompressed and compressed (X.xml and X.xml.gz), only the first one is read (in folders
+    and zip archives the uncompressed one) and a warning is printed.
+    """
+    path = Path(path)
+    if path.is_dir():
+        yield from _folder_files(path, pattern)
+    elif not is_archive(path):
+        yield path.as_posix()
+    elif path.name.lower().endswith('.zip'):
+        import zipfile
+        with zipfile.ZipFile(path) as archive:
+            for name in _zip_members(archive, pattern):
+                yield f'{path.as_posix()}/{name}', archive.read(name)
+    else:
+        import tarfile
+        with tarfile.open(path, mode='r|*') as archive:
+            members = (member for member in archive if member.isfile() and _matches(member.name, pattern))
+            for member in _skip_compressed_copies(members, lambda member: member.name):
+                yield f'{path.as_posix()}/{member.name}', archive.extractfile(member).read()
+
+
+def count_sources(path: str | Path, pattern: str = '*.xml') -> int | None:
+    """Returns the number of sources iter_sources yields for path without reading them, or None for tar archives,
+    which would have to be read to count their members."""
+    path = Path(path)
+    if path.is_dir():
+        return len(_folder_files(path, pattern, warn=False))
+    if not is_archive(path):
+        return 1
+    if path.name.lower().endswith('.zip'):
+        import zipfile
+        with zipfile.ZipFile(path) as archive:
+            return len(_zip_members(archive, pattern, warn=False))
+    return None
+
+
+def source_name(source: Source) -> str:
+    """Returns the path of a file or the name of an archive member."""
+    return source if isinstance(source, str) else source[0]
+
+
+def source_stem(source: Source) -> str:
+    """Returns the filename of a source without the suffixes .gz and .xml, e.g. for the output files."""
+    name = PurePosixPath(source_name(source)).name
+    for suffix in ('.gz', '.xml'):
+        if name.lower().endswith(suffix):
+            name = name[:-len(suffix)]
+    return name
+
+
+def open_source(source: Source) -> str | BinaryIO:
+    """Returns the input for Page: the path of a file or a binary file object with the (decompressed) content of an
+    archive member, named after the member."""
+    if isinstance(source, str):
+        return source
+    name, data = source
+    if data[:2] == b'\x1f\x8b':
+        data = gzip.decompress(data)
+    f = io.BytesIO(data)
+    f.name = name
+    return f
@@ -0,0 +1,78 @@
+import numpy as np
+
+
+class LineIndex:
+    """
+    Class LineIndex: A spatial index over the bounding boxes (x_min, y_min, x_max, y_max) of the TextLines of a Page,
+    e.g. Page.baseline_bboxes. The lines are sorted by y_min and by the center of y, so that bounding box and band
+    queries and the nearest lines above and below are found by binary search instead of scanning all lines. All
+    queries return indices of TextLines (in the order of Page.line_ids). Lines without points (bounding box -1) are
+    not indexed.
+    """
+    def __init__(self, bboxes: np.ndarray):
+        self.bboxes: np.ndarray = np.asarray(bboxes, dtype=np.int64).reshape(-1, 4)
+        valid = np.flatnonzero(self.bboxes[:, 2] >= 0)
+        boxes = self.bboxes[valid]
+        self.y_centers: np.ndarray = np.full(len(self.bboxes), np.nan)
+        self.y_centers[valid] = (boxes[:, 1] + boxes[:, 3]) / 2
+        # by y_min for bbox queries: a line can only intersect [y0, y1] if y0 - max_height <= y_min <= y1
+        order = np.argsort(boxes[:, 1], kind='stable')
+        self._by_top = valid[order]
+        self._tops = boxes[order, 1]
+        self._max_height = int((boxes[:, 3] - boxes[:, 1]).max()) if len(boxes) else 0
+        # by y center for band and neighbour queries
+        order = np.lexsort((boxes[:, 0], self.y_centers[valid]))
+        self._by_center = valid[order]
+        self._centers = self.y_centers[self._by_center]
+        self._rank = np.full(len(self.bboxes), -1, dtype=np.int64)
+        self._rank[self._by_center] = np.arange(len(self._by_center))
+
+    def __repr__(self):
+        return f'LineIndex({len(self._by_center)} lines)'
+
+    def __len__(self):
+        return len(self._by_center)
+
+    def bbox(self, x0: int, y0: int, x1: int, y1: int) -> np.ndarray:
+        """Returns the lines whose bounding boxes intersect the box (x0, y0, x1, y1), sorted by y_min."""
+        start = np.searchsorted(self._tops, y0 - self._max_height, side='left')
+        end = np.searchsorted(self._tops, y1, side='right')
+        candidates = self._by_top[start:end]
+        boxes = self.bboxes[candidates]
+        hit = (boxes[:, 3] >= y0) & (boxes[:, 0] <= x1) & (boxes[:, 2] >= x0)
+        return candidates[hit]
+
+    def band(self, y0: float, y1: float, x0: float | None = None, x1: float | None = None) -> np.ndarray:
+        """Returns the lines whose center of y lies within [y0, y1], sorted by it (and by x_min). If x0 and x1 are
+        given, only the lines overlapping [x0, x1] horizontally are returned, e.g. the lines of one column."""
+        start = np.searchsorted(self._centers, y0, side='left')
+        end = np.searchsorted(self._centers, y1, side='right')
+        lines = self._by_center[start:end]
+        if x0 is not None and x1 is not None:
+            boxes = self.bboxes[lines]
+            lines = lines[(boxes[:, 0] <= x1) & (boxes[:, 2] >= x0)]
+        return lines
+
+    def _neighbour(self, line: int, step: int) -> int | None:
+        rank = self._rank[line]
+        if rank < 0:
+            raise ValueError(f'TextLine {line} has no points.')
+        x0, _, x1, _ = self.bboxes[line]
+        center = self._centers[rank]
+        rank += step
+        while 0 <= rank < len(self._by_center):
+            other = self._by_center[rank]
+            box = self.bboxes[other]
+            if self._centers[rank] != center and box[0] <= x1 and box[2] >= x0:
+                return int(other)
+            rank += step
+        return None
+
+    def above(self, line: int) -> int | None:
+        """Returns the nearest line above line that overlaps it horizontally (e.g. in the same column) or None. Lines
+        of other columns between them in y are skipped."""
+        return self._neighbour(line, -1)
+
+    def below(self, line: int) -> int | None:
+        """Returns the nearest line below line that overlaps it horizontally (e.g. in the same column) or None."""
+        return self._neighbour(line, 1)
@@ -0,0 +1,130 @@
+"""
+Threshold sweep for the segmentation of books into entries (see blatt.layout): the vertical distances dy0 between
+consecutive lines of all pages are computed once, then the segments (split at |dy0| >= min_dy) and the entries left
+after merging segments across page breaks (see continues_segment, max_dy) are counted for a grid of thresholds from
+these arrays, without parsing the pages again. suggest_thresholds proposes thresholds from the distribution of the
+distances.
+"""
+from .layout import page_layout
+from .sources import Source, open_source, source_name
+from functools import partial
+from pathlib import Path
+from typing import Dict, Iterable, Sequence, Tuple
+import numpy as np
+
+SWEEP_DTYPE = np.dtype([('min_dy', np.float64), ('max_dy', np.float64), ('segments', np.int64), ('merged', np.int64),
+                        ('entries', np.int64)])
+
+
+def page_gaps(source: Source, columns: int = 2) -> Tuple[np.ndarray, np.ndarray]:
+    """Worker: parses a PAGE XML file (a path or an archive member, see blatt.sources) and returns dy0 of its lines in
+    reading order (see page_layout) and whether they contain ':'. Module-level to be picklable."""
+    from .page import Page
+    from .parallel import worker_errors
+    with worker_errors(source_name(source)):
+        page = Page(open_source(source), streaming=True)
+        layout = page_layout(page, columns)
+        colon = np.array([':' in page.text_lines[i] for i in layout['order'].tolist()], dtype=bool)
+    return layout['dy0'], colon
+
+
+def book_gaps(sources: Iterable[Source], columns: int = 2, jobs: int = 1) -> Dict[str, np.ndarray]:
+    """Parses the pages of a book in a pool of jobs processes and returns dy0 and the ':' flags of all lines
+    concatenated in order, and the offsets of the pages (the lines of page i are page_offsets[i:i + 2])."""
+    from .parallel import imap
+    dy0, colon, sizes = [], [], [0]
+    for page_dy0, page_colon in imap(partial(page_gaps, columns=columns), sources, jobs):
+        dy0.append(page_dy0)
+        colon.append(page_colon)
+        sizes.append(len(page_dy0))
+    return {'dy0': np.concatenate(dy0) if dy0 else np.empty(0), 'colon': np.concatenate(colon) if colon else
+            np.empty(0, dtype=bool), 'page_offsets': np.cumsum(sizes)}
+
+
+def save_gaps(gaps: Dict[str, np.ndarray], filename: str | Path):
+    """Saves the arrays of book_gaps into an NPZ file."""
+    with open(filename, 'wb') as f:
+        np.savez(f, **gaps)
+
+
+def load_gaps(filename: str | Path) -> Dict[str, np.ndarray]:
+    """Loads the arrays of book_gaps from an NPZ file."""
+    with np.load(filename) as data:
+        return {name: data[name] for name in ('dy0', 'colon', 'page_offsets')}
+
+
+def sweep(gaps: Dict[str, np.ndarray], min_dys: Sequence[float], max_dys: Sequence[float]) -> np.ndarray:
+    """
+    Counts the segments and entries of the book for every pair of thresholds: 'segments' split at |dy0| >= min_dy,
+    'merged' the first segments of pages continuing the previous one (at least two lines, whose dy0 are at most
+    max_dy or which both contain ':') and 'entries' the segments left. Returns a structured array with SWEEP_DTYPE,
+    one row per pair (min_dy, max_dy).
+    """
+    dy0, colon, offsets = gaps['dy0'], gaps['colon'], gaps['page_offsets']
+    sizes = np.diff(offsets)
+    # the first segments of the pages after the first line of the book
+    pages = np.flatnonzero((sizes >= 2) & (offsets[:-1] > 0))
+    first = offsets[pages]
+    with np.errstate(invalid='ignore'):
+        head = np.maximum(dy0[first], dy0[first + 1])
+        distances = np.abs(dy0)
+    colons = colon[first] & colon[first + 1]
+    max_dys = np.asarray(max_dys, dtype=np.float64)
+    rows = np.empty(len(min_dys) * len(max_dys), dtype=SWEEP_DTYPE)
+    for i, min_dy in enumerate(min_dys):
+        with np.errstate(invalid='ignore'):
+            boundary = distances >= min_dy
+            continues = (head[:, None] <= max_dys[None, :]) | colons[:, None]
+        segments = int(np.count_nonzero(boundary)) + int(np.count_nonzero(sizes))
+        merged = np.count_nonzero(continues & ~boundary[first][:, None], axis=0)
+        block = rows[i * len(max_dys):(i + 1) * len(max_dys)]
+        block['min_dy'] = min_dy
+        block['max_dy'] = max_dys
+        block['segments'] = segments
+        block['merged'] = merged
+        block['entries'] = segments - merged
+    return rows
+
+
+def _line_distances(gaps: Dict[str, np.ndarray]) -> np.ndarray:
+    """Returns the positive distances dy0 (to the next line in the same column) without the top 1 % (e.g. gaps
+    before footers)."""
+    dy0 = gaps['dy0']
+    values = dy0[np.isfinite(dy0) & (dy0 > 0)]
+    if not len(values):
+        raise ValueError('No distances between lines.')
+    return values[values <= np.percentile(values, 99)]
+
+
+def gap_histogram(gaps: Dict[str, np.ndarray], bins: int = 30) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns the histogram (counts, bin edges) of the distances between consecutive lines of a column."""
+    return np.histogram(_line_distances(gaps), bins=bins)
+
+
+def suggest_thresholds(gaps: Dict[str, np.ndarray]) -> Dict[str, float]:
+    """
+    Suggests thresholds from the distances between consecutive lines of a column, which mix the line spacing within
+    entries and the larger gaps between entries: min_dy is the threshold separating both groups best (Otsu's method,
+    maximal variance between the groups, in the middle of the gap between them), max_dy the 95th percentile of the
+    line spacing below min_dy. Also returns the median 'line_spacing'.
+    """
+    values = _line_distances(gaps)
+    counts, edges = np.histogram(values, bins=256)
+    centers = (edges[:-1] + edges[1:]) / 2
+    below = np.cumsum(counts)
+    above = below[-1] - below
+    weighted = np.cumsum(counts * centers)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        between = below * above * (weighted / below - (weighted[-1] - weighted) / above) ** 2
+    between = np.where((below > 0) & (above > 0), between, -1)
+    if between.max() < 0:
+        # all distances in one bin: no gaps between entries
+        min_dy = float(values.max())
+    else:
+        # the variance is the same for all thresholds in an empty range of the histogram: take its middle
+        best = np.flatnonzero(between == between.max())
+        min_dy = float(edges[best[0] + 1] + edges[best[-1] + 1]) / 2
+    spacing = values[values < min_dy]
+    if not len(spacing):
+        spacing = values
+    return {'min_dy': min_dy, 'max_dy': float(np.percentile(spacing, 95)), 'line_spacing': float(np.median(spacing))}
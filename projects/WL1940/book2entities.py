@@ -1,16 +1,25 @@
 import pandas as pd
 from tqdm import tqdm
 from blatt import Page
+from blatt.keys import KeyNormalizer
+from blatt.layout import iter_book_segments, page_layout, segment_ids
+from blatt.rules import KeyValueRules
 from pathlib import Path
-import difflib
 import numpy as np
 import csv
+import os
 import matplotlib.pyplot as plt
 
 # these values are needed for merging and splitting segments
 
+# The number of entries per threshold and suggested thresholds: `blatt sweep --cache BOOK.npz BOOK`
 MAXDY0 = 30  # Maximal difference in Y0 between the lines for merging segments
 MINDY0 = 50  # Minimal difference in Y0 between the lines for splitting segments
+COLUMNS = ['left', 'right']  # names of the columns 0 and 1 of blatt.layout
+JOBS = os.cpu_count() or 1  # worker processes for parsing and segmenting the pages
+KEYS = KeyNormalizer()  # no curated groups of properties yet, see KEYS.cluster below
+# Rules for splitting the lines of a segment into the name and the properties of an entity
+RULES = KeyValueRules.load(Path(__file__).with_name('rules.json'))
 
 # paths = ['../../../page-xml-40/516401084_19400001_aanm3ed.pdf_page_' + str(n) + '.xml' for n in range(19,1043)]
 paths = ['../../../page-xml-41-42/516401084_' + str(n).zfill(4) + '.xml' for n in range(21, 1183)]
@@ -25,40 +34,28 @@ class PageTwoColumns(Page):
         self.process_2columns()
 
     def process_2columns(self):
-        # Separate into left and right columns
-        for i, line in enumerate(self.text_regions):
-            if line[3][0][0] <= self.center_baseline[0]:
-                line.append('left')
-            else:
-                line.append('right')
-        df = pd.DataFrame(self.text_regions,
+        # Separate into left and right columns, sort the lines into reading order (column, Ym, X0) and mark the
+        # ends of segments (|dY0| >= MINDY0) with the vectorized blatt.layout
+        layout = page_layout(self, boundaries=[self.center_baseline[0]], min_dy=MINDY0)
+        rows = [self.text_regions[i] + [COLUMNS[column]] for i, column in zip(layout['order'].tolist(),
+                                                                               layout['column'].tolist())]
+        df = pd.DataFrame(rows,
                           columns=['Line', 'TextRegionID', 'Line_ID',
                                    'Baseline_coords', 'Column'])
-        df.index.name = 'Index'
-        df['X0'] = df['Baseline_coords'].apply(lambda x: x[0][0])
-        df['Y0'] = df['Baseline_coords'].apply(lambda x: x[0][1])
-        df['Y1'] = df['Baseline_coords'].apply(lambda x: x[1][1])
-        df['Ym'] = (df['Y0'] + df['Y1']) * 0.5
-        df = df.sort_values(by=['Column', 'Ym', 'X0'])
-        df = df.dropna(subset=['Line'])  # Remove None lines
-        df['dY0'] = df['Y0'].shift(-1) - df['Y0']
-        df = df.reset_index()
+        df.insert(0, 'Index', layout['order'])
+        for column in ('X0', 'Y0', 'Y1', 'Ym', 'dY0'):
+            df[column] = layout[column.lower()]
 
         # Set 'SegmentID' for different segments. Don't use TextRegionID like this:
         # df['SegmentID'] = df['TextRegionID'].apply(lambda x: list(dict.fromkeys(df['TextRegionID'])).index(x))
-        df['Segmentation'] = (df['dY0'].apply(lambda x: True if abs(x) >= MINDY0 else False))
+        df['Segmentation'] = layout['boundary']
         # first two lines of segments cannot be with ':'
         for i in range(0, 2):
             if ((df['Segmentation'].loc[i] == True) & (':' in df['Line'].loc[i])) and (
                     df['Line'].loc[i] != 'Eigene Vertretungen im Ausland: Kowno, Riga.'):
-                df['Segmentation'].loc[i] = False
+                df.loc[i, 'Segmentation'] = False
 
-        segid = 0
-        df['SegmentID'] = ''
-        for i, seg in df['Segmentation'].items():
-            df['SegmentID'].loc[i] = segid
-            if seg:
-                segid += 1
+        df['SegmentID'] = segment_ids(df['Segmentation'].to_numpy())
 
         # 'Removing headers': if two consequent rows refer to new segments, remove the second row
         df.drop(df[(df['Segmentation'] == True) & (df['Segmentation'].shift(1) == True)].index, inplace=True)
@@ -118,22 +115,28 @@ class PageTwoColumns(Page):
         self.dataframe = df
         segments = {}
         for sid in set(df['SegmentID']):
-            segments[self.filename + '_' + str(sid)] = df[df['SegmentID'] == sid][
+            segments[self.filename.as_posix() + '_' + str(sid)] = df[df['SegmentID'] == sid][
                 ['Line', 'Line_ID', 'dY0']].values.tolist()
         self.segments = segments
         self.dY0 = df['dY0'].tolist()
 
 
+def page_segments(path):
+    """Parses and segments a page (in a worker process). Returns its segments (key, lines, first) for
+    blatt.layout.iter_book_segments, the first segment of a page (ID ending with 0) may continue the previous one"""
+    return [(k, v, k.endswith('0')) for k, v in PageTwoColumns(path).segments.items()]
+
+
 class Entities:
     """
-    Class Entities: Takes list of paths to page-xml files, executes Page() on them,
-    merge segments from consequent pages, removes hyphens and extracts entities.
+    Class Entities: Takes list of paths to page-xml files, executes Page() on them in parallel,
+    merges segments from consequent pages, removes hyphens and extracts entities segment by segment.
+    Only the segments of the pages in flight are kept in memory, not the pages.
     """
 
-    def __init__(self, paths=[]):
-        self.read_files(paths)
-        self.merge_segments()
-        self.get_entities()
+    def __init__(self, paths=[], jobs=JOBS):
+        self.dY0 = []
+        self.entities = dict(self.iter_entities(paths, jobs))
 
     def __repr__(self):
         return "Pages list of (attribute, length): " + str([(k, len(v)) for k, v in self.__dict__.items()])
@@ -141,35 +144,20 @@ class Entities:
     def __str__(self):
         return 'An object of Pages()'
 
-    def read_files(self, paths):
-        d = {}
-        for i, path in tqdm(enumerate(paths)):
-            d[i + 1] = PageTwoColumns(path)
-        self.d = d
-
-    def merge_segments(self):
-        segments = {}
-        for p in self.d.values():
-            segments = {**segments, **p.segments}
-        # Merge segments from different pages
-        idx = []
-        for k, v in segments.items():
-            if k.endswith('0'):
-                try:
-                    if ((v[0][2] <= MAXDY0 and v[1][2] <= MAXDY0) or (':' in v[0][0] and ':' in v[1][0])):
-                        segments[list(segments.keys())[list(segments.keys()).index(k) - 1]].extend(v)
-                        idx.append(k)
-                except Exception as e:
-                    print(k, v, e)
-        for i in idx:
-            del segments[i]
-        self.segments = segments
-        s, m = {}, {}
-        for k, v in self.segments.items():
-            s[k] = '\n'.join([k[0] for k in v])
-            m[k] = Page.remove_hyphens([k[0] for k in v])
-        self.segments_text = s
-        self.segments_text_unhyphenated = m
+    def iter_entities(self, paths, jobs=JOBS):
+        """Yields the entities (name, properties) as soon as their segments are merged"""
+        for k, v in iter_book_segments(tqdm(paths), page_segments, MAXDY0, jobs):
+            self.dY0.extend(line[2] for line in v)
+            lines = [line[0] for line in v]
+            raw_text, raw_text_1line = '\n'.join(lines), Page.remove_hyphens(lines)
+            for name, val in self.get_entities(k, v).items():
+                entity = {key: value for d in val for key, value in d.items()}
+                length = [len(entity), len(val)]
+                entity = KEYS.merge(entity.items())
+                entity['LENGTH'] = length
+                entity['RAW_TEXT'] = raw_text
+                entity['RAW_TEXT_1LINE'] = raw_text_1line
+                yield name, entity
 
     def unhyphenate(self, txt=list):
         """ Removes hyphens from OCR-ed strings stored in a list
@@ -191,108 +179,55 @@ class Entities:
                     new.append(txt[i + 1])
         return new
 
-    @staticmethod
-    def _conditions(k):
-        return (':' in k) and \
-               ('stellv.' not in k.split(':', 1)[0].lower()) and \
-               (not any(t.isdigit() for t in k.split(':', 1)[0])) and \
-               (k.split(':', 1)[0] not in [''])
-
-    def get_entities(self):
-        s = {}
-        for k, v in self.segments.items():
-            s[k] = self.unhyphenate([k[0] for k in v])
-        entities = {}
-        for k, v in s.items():
-            v = [m.replace('::', ':') for m in v if m]  # Only non-None
-            sis = [i for i, k in enumerate(v) if self._conditions(k)]
-            if sis:  # Don't take exceptions with 'Inhaber:' in a company name
-                if v[sis[0]].startswith('Inhaber:'):
-                    del sis[0]
-            METADATA = {'FILE_SEGMENT': k}
-            if sis:
-                entities[joiner(v[0:sis[0]])] = [METADATA]
-                for i, si in enumerate(sis):
-                    if (i < len(sis) - 1) and (sis[i] + 1 == sis[i + 1]):
-                        entities[joiner(v[0:sis[0]])].append(
-                            {v[si].split(': ', 1)[0]: joiner(v[si].split(': ', 1)[1:])})
-                    elif (i == len(sis) - 1):
-                        entities[joiner(v[0:sis[0]])].append(
-                            {v[si].split(': ', 1)[0]: joiner(v[si].split(': ', 1)[1:]) +
-                                                      ' ' + joiner(v[si + 1:len(v)])})
-                    else:
-                        entities[joiner(v[0:sis[0]])].append(
-                            {v[si].split(': ', 1)[0]: joiner(v[si].split(': ', 1)[1:]) +
-                                                      ' ' + joiner(v[si + 1:sis[i + 1]])})
-            else:
-                if v:
-                    entities[v[0]] = [METADATA]
-
-        ents = {}
-        for key, val in entities.items():
-            ents[key] = {k: v for d in val for k, v in d.items()}
-            ents[key]['LENGTH'] = [len(ents[key]), len(val)]
-        self.entities = ents
-
-
-def joiner(x):
-    """Helper join-function"""
-    if len(x) == 0:
-        return ''
-    if len(x) == 1:
-        return x[0]
-    if len(x) > 1:
-        return ' '.join(x)
-
-
-pages = Entities(paths)
-
-# Postprocessing
-entities = pages.entities
-
-for key, value in entities.items():
-    value['RAW_TEXT'] = pages.segments_text[value['FILE_SEGMENT']]
-    value['RAW_TEXT_1LINE'] = pages.segments_text_unhyphenated[value['FILE_SEGMENT']]
-table = pd.DataFrame(entities).T.reset_index().fillna('')
-table = table.rename(columns={'index': 'CEO'})  # RAW STRUCTURED DATA
-
-## Quality checks
-
-# Print entities with repeating properties
-repeated_ents = []
-for k, v in pages.entities.items():
-    if v['LENGTH'][0] != v['LENGTH'][1]:
-        repeated_ents.append([v['LENGTH'], k, '   ', v['FILE_SEGMENT'], v])
-
-# Sorting and grouping the properties
-properties = sorted(table.columns.to_list())
-props = table.describe().T.reset_index()
-prop_groups = {}
-for prop in properties:
-    prop_groups[prop] = frozenset(difflib.get_close_matches(prop, properties, n=30, cutoff=0.65))
-unique_prop_groups = []
-for prop in set(prop_groups.values()):
-    unique_prop_groups.append(set(prop))
-
-# Remove all properties with two or less values
-props = table.describe().T.reset_index()
-props = props[props['unique'] > 8]
-for prop in props[props['unique'] <= 8]['index']:
-    try:
-        table.drop(prop, axis=1, inplace=True)
-    except Exception:
-        pass
-
-props = props.sort_values(by=['unique'], ascending=False)
-cols = props['index'].tolist()
-tablet = table[cols]  # REDUCED STRUCTURED DATA
-
-print('Repeated properties in ' + str(len(repeated_ents)) + ' entities and MAXDY0=' + str(MAXDY0))
-
-# Plot DY0 distribution
-x = []
-for v, d in pages.d.items():
-    x.extend(d.dY0)
-counts, bins, bars = plt.hist(x, bins=1000, histtype='step')
-plt.xlim(20, 80)
-plt.show()
+    def get_entities(self, k, v):
+        """Extracts the entity of the segment k from its lines v with the rules in rules.json"""
+        name, properties = RULES.extract(self.unhyphenate([line[0] for line in v]))
+        if not (name or properties):
+            return {}
+        return {name: [{'FILE_SEGMENT': k}] + [{key: value} for key, value in properties]}
+
+
+# The pipeline runs only when the script is executed, not when the worker processes of iter_book_segments
+# import it (spawn and forkserver start methods, e.g. on macOS and Windows)
+if __name__ == '__main__':
+    pages = Entities(paths)
+
+    # Postprocessing
+    entities = pages.entities
+
+    table = pd.DataFrame(entities).T.reset_index().fillna('')
+    table = table.rename(columns={'index': 'CEO'})  # RAW STRUCTURED DATA
+
+    ## Quality checks
+
+    # Print entities with repeating properties
+    repeated_ents = []
+    for k, v in pages.entities.items():
+        if v['LENGTH'][0] != v['LENGTH'][1]:
+            repeated_ents.append([v['LENGTH'], k, '   ', v['FILE_SEGMENT'], v])
+
+    # Sorting and grouping the properties
+    properties = sorted(table.columns.to_list())
+    props = table.describe().T.reset_index()
+    # Groups of similar properties (OCR variants), e.g. for curating canonical keys (see KeyNormalizer.load)
+    unique_prop_groups = [set(group) for group in KEYS.cluster(properties)]
+
+    # Remove all properties with two or less values
+    props = table.describe().T.reset_index()
+    props = props[props['unique'] > 8]
+    for prop in props[props['unique'] <= 8]['index']:
+        try:
+            table.drop(prop, axis=1, inplace=True)
+        except Exception:
+            pass
+
+    props = props.sort_values(by=['unique'], ascending=False)
+    cols = props['index'].tolist()
+    tablet = table[cols]  # REDUCED STRUCTURED DATA
+
+    print('Repeated properties in ' + str(len(repeated_ents)) + ' entities and MAXDY0=' + str(MAXDY0))
+
+    # Plot DY0 distribution
+    counts, bins, bars = plt.hist(pages.dY0, bins=1000, histtype='step')
+    plt.xlim(20, 80)
+    plt.show()
@@ -12,7 +12,7 @@ setup(
     long_description=long_description,
     long_description_content_type="text/markdown",
     url="https://github.com/UB-Mannheim/blatt",
-    install_requires=['lxml', 'tqdm', 'click', 'segtok'],
+    install_requires=['lxml', 'tqdm', 'click', 'segtok', 'numpy'],
     packages=find_packages(),
     classifiers=[
         "Programming Language :: Python :: 3",
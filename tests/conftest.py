@@ -0,0 +1,16 @@
+from pathlib import Path
+import sys
+import pytest
+
+# The synthetic PAGE XML generator of the benchmarks
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'benchmarks'))
+
+from synthetic import write_synthetic_folder  # noqa: E402
+
+
+@pytest.fixture
+def page_folder(tmp_path: Path) -> Path:
+    """A folder with 6 synthetic two-column pages."""
+    folder = tmp_path / 'pages'
+    write_synthetic_folder(folder, 6, regions=4, lines=20)
+    return folder
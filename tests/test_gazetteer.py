@@ -0,0 +1,60 @@
+from blatt.gazetteer import Gazetteer
+import json
+import pytest
+import random
+
+LEGAL_FORMS = {'GmbH': ['G. m. b. H.', 'Ges. m. b. H.'], 'AG': ['A.-G.', 'Aktiengesellschaft'], 'KG': ['K.-G.']}
+
+
+def naive_find(patterns, text, ignore_case=True):
+    fold = str.lower if ignore_case else str
+    matches = set()
+    for label, label_patterns in patterns.items():
+        for pattern in label_patterns:
+            for start in range(len(text) - len(pattern) + 1):
+                if fold(text[start:start + len(pattern)]) == fold(pattern):
+                    matches.add((start, start + len(pattern), label))
+    return sorted(matches)
+
+
+@pytest.mark.parametrize('ignore_case', [True, False])
+def test_find_matches_naive_scan(ignore_case):
+    r = random.Random(0)
+    for _ in range(100):
+        patterns = {f'L{i}': [''.join(r.choice('abAB') for _ in range(r.randint(1, 4))) for _ in range(r.randint(1, 3))]
+                    for i in range(r.randint(1, 6))}
+        gazetteer = Gazetteer(patterns, ignore_case=ignore_case)
+        for _ in range(10):
+            text = ''.join(r.choice('abAB') for _ in range(r.randint(0, 30)))
+            assert gazetteer.find(text) == naive_find(patterns, text, ignore_case)
+
+
+def test_find():
+    gazetteer = Gazetteer(LEGAL_FORMS)
+    text = 'Meyer Ges. m. b. H. und Schulze Kommanditgesellschaft, aktiengesellschaft'
+    assert gazetteer.find(text) == [(6, 19, 'GmbH'), (55, 73, 'AG')]
+    assert Gazetteer(LEGAL_FORMS, ignore_case=False).find(text) == [(6, 19, 'GmbH')]
+    assert list(gazetteer.tag(['A.-G.', '', 'X K.-G.'])) == [[(0, 5, 'AG')], [], [(2, 7, 'KG')]]
+
+
+def test_positions_with_case_folding():
+    # 'İ'.lower() has two characters, the spans still refer to the original text
+    text = 'İstanbul A.-G.'
+    assert Gazetteer(LEGAL_FORMS).find(text) == [(9, 14, 'AG')]
+
+
+def test_labels():
+    gazetteer = Gazetteer(LEGAL_FORMS)
+    assert gazetteer.labels('K.-G., Aktiengesellschaft und G. m. b. H.') == ['GmbH', 'AG', 'KG']
+    assert gazetteer.labels('Firma X') == []
+
+
+def test_empty_pattern():
+    with pytest.raises(ValueError):
+        Gazetteer({'X': ['']})
+
+
+def test_load(tmp_path):
+    with open(tmp_path / 'legal_forms.json', 'w', encoding='utf-8') as f:
+        json.dump(LEGAL_FORMS, f)
+    assert Gazetteer.load(tmp_path / 'legal_forms.json').labels('A.-G.') == ['AG']
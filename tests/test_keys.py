@@ -0,0 +1,59 @@
+from blatt.keys import KeyNormalizer
+from difflib import SequenceMatcher
+import pytest
+import random
+
+
+def test_load_save_normalize(tmp_path):
+    keys = KeyNormalizer({'Postscheck-Konto': ['Postseheck-Konto', 'Fostscheck-Konto']})
+    keys.save(tmp_path / 'keys.json')
+    loaded = KeyNormalizer.load(tmp_path / 'keys.json')
+    assert loaded.canonical == keys.canonical
+    assert loaded.normalize('Fostscheck-Konto') == 'Postscheck-Konto'
+    assert loaded.normalize('Inhaber') == 'Inhaber'
+
+
+def test_conflicting_variants():
+    with pytest.raises(ValueError):
+        KeyNormalizer({'A': ['x'], 'B': ['x']})
+
+
+def test_merge():
+    keys = KeyNormalizer({'Kapital': ['Kapitel']})
+    items = [('Kapital', '1 Mill.'), ('Inhaber', ''), ('Kapitel', '2 Mill.'), ('Inhaber', 'X')]
+    assert keys.merge(items) == {'Kapital': '1 Mill.; 2 Mill.', 'Inhaber': 'X'}
+
+
+def brute_force_cluster(keys, cutoff):
+    keys = list(dict.fromkeys(keys))
+    parent = list(range(len(keys)))
+
+    def find(i):
+        while parent[i] != i:
+            i = parent[i]
+        return i
+
+    for i in range(len(keys)):
+        for j in range(i):
+            if SequenceMatcher(None, keys[j], keys[i]).ratio() >= cutoff:
+                parent[max(find(i), find(j))] = min(find(i), find(j))
+    clusters = {}
+    for i, key in enumerate(keys):
+        clusters.setdefault(find(i), []).append(key)
+    return list(clusters.values())
+
+
+def test_cluster():
+    keys = KeyNormalizer({'Kapital': ['Grundkapital']})
+    assert keys.cluster(['Postscheck-Konto', 'Kapital', 'Postseheck-Konto', 'Grundkapital', 'Inhaber']) == [
+        ['Postscheck-Konto', 'Postseheck-Konto'], ['Kapital', 'Grundkapital'], ['Inhaber']]
+    # similar keys without a common trigram are only found in exact mode
+    assert keys.cluster(['egecd', 'gcdc']) == [['egecd'], ['gcdc']]
+    assert keys.cluster(['egecd', 'gcdc'], exact=True) == [['egecd', 'gcdc']]
+
+
+@pytest.mark.parametrize('cutoff', [0.0, 0.3, 0.65, 0.9])
+def test_cluster_exact_matches_brute_force(cutoff):
+    r = random.Random(0)
+    words = [''.join(r.choice('abcde') for _ in range(r.randint(1, 8))) for _ in range(150)]
+    assert KeyNormalizer(cutoff=cutoff).cluster(words, exact=True) == brute_force_cluster(words, cutoff)
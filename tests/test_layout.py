@@ -0,0 +1,133 @@
+from blatt import Page
+from blatt.layout import (assign_columns, column_boundaries, continues_segment, gap_boundaries, iter_merge_segments,
+                          merge_segments, page_layout, reading_order, segment_ids, segment_table)
+import copy
+import numpy as np
+import random
+
+
+def test_column_boundaries():
+    x = np.array([100, 102, 1250, 101, np.nan, 1251])
+    assert column_boundaries(x, 2).tolist() == [102]
+    assert column_boundaries(x, 1).tolist() == []
+    assert column_boundaries(np.array([5.0]), 2).tolist() == []
+
+
+def test_assign_columns():
+    # x <= boundary is the left column
+    assert assign_columns(np.array([100, 102, 103, 1250]), [102]).tolist() == [0, 0, 1, 1]
+    assert assign_columns(np.array([1, 5, 9]), [6, 2]).tolist() == [0, 1, 2]
+
+
+def test_reading_order():
+    columns = np.array([1, 0, 0, 1])
+    y = np.array([10, 20, 10, 5])
+    x = np.array([0, 0, 0, 0])
+    assert reading_order(columns, y, x).tolist() == [2, 1, 3, 0]
+
+
+def test_segment_ids_and_table():
+    dy = np.array([40, 90, -500, 40, np.nan])
+    boundaries = gap_boundaries(dy, 86)
+    assert boundaries.tolist() == [False, True, True, False, False]
+    segments = segment_ids(boundaries)
+    assert segments.tolist() == [0, 0, 1, 2, 2]
+    table = segment_table(segments, np.array([0, 0, 0, 1, 1]), np.array([10, 50, 140, 20, np.nan]))
+    assert table['start'].tolist() == [0, 2, 3]
+    assert table['stop'].tolist() == [2, 3, 5]
+    assert table['column'].tolist() == [0, 0, 1]
+    assert table['top'].tolist() == [10, 140, 20]
+    assert table['bottom'].tolist() == [50, 140, 20]
+    assert len(segment_table(np.empty(0, dtype=np.int64), np.empty(0), np.empty(0))) == 0
+
+
+def reference_layout(page, min_dy):
+    """The former pure-Python logic of the project scripts: split at the center of the Baselines, sort by column,
+    mean y of the first two Baseline points and x, and start a new segment after |dy0| >= min_dy."""
+    center = page.center_baseline[0]
+    rows = []
+    for i in range(len(page.text_lines)):
+        j = page.text_line_index[i]
+        points = page.baseline_points[page.baseline_offsets[j]:page.baseline_offsets[j + 1]].tolist()
+        x0, y0 = points[0]
+        y1 = points[1][1] if len(points) > 1 else y0
+        rows.append((0 if x0 <= center else 1, (y0 + y1) / 2, x0, y0, i))
+    rows.sort(key=lambda row: row[:3])
+    segments, segment = [], 0
+    for k, row in enumerate(rows):
+        segments.append(segment)
+        if k + 1 < len(rows) and abs(rows[k + 1][3] - row[3]) >= min_dy:
+            segment += 1
+    return [row[4] for row in rows], segments
+
+
+def test_page_layout_matches_reference(page_folder):
+    for path in sorted(page_folder.iterdir()):
+        page = Page(path, streaming=True)
+        layout = page_layout(page, boundaries=[page.center_baseline[0]], min_dy=86)
+        order, segments = reference_layout(page, 86)
+        assert layout['order'].tolist() == order
+        assert layout['segment'].tolist() == segments
+        assert np.isnan(layout['dy0'][-1])
+        assert layout['segments']['stop'][-1] == len(order)
+
+
+def test_page_layout_detects_columns(page_folder):
+    page = Page(sorted(page_folder.iterdir())[0], streaming=True)
+    detected = page_layout(page, columns=2)
+    given = page_layout(page, boundaries=[page.center_baseline[0]])
+    assert detected['column'].tolist() == given['column'].tolist()
+    assert set(detected['column'].tolist()) == {0, 1}
+
+
+def test_continues_segment():
+    assert continues_segment([('a', 'l0', 40), ('b', 'l1', 50)], 59)
+    assert not continues_segment([('a', 'l0', 40), ('b', 'l1', 60)], 59)
+    assert continues_segment([('Key: a', 'l0', 90), ('Other: b', 'l1', 90)], 59)
+    assert not continues_segment([('a', 'l0', 10)], 59)
+    assert not continues_segment([], 59)
+
+
+def naive_merge(segments, max_dy):
+    """Merges segments like the former project scripts: a continuing segment is appended to the last segment kept
+    so far, searching the keys of the dict on every segment."""
+    merged = {}
+    for key, lines, first in segments:
+        keys = list(merged)
+        if first and keys and continues_segment(lines, max_dy):
+            merged[keys[-1]] = merged[keys[-1]] + list(lines)
+        else:
+            merged[key] = list(lines)
+    return merged
+
+
+def random_book(r, pages=30):
+    segments = []
+    for page in range(pages):
+        for s in range(r.randint(0, 4)):
+            lines = [(r.choice(['a', 'Key: b', 'c']), f'l{i}', r.choice([40.0, 55.0, 70.0, 90.0, np.nan]))
+                     for i in range(r.randint(1, 4))]
+            segments.append((f'page{page}_{s}', lines, s == 0))
+    return segments
+
+
+def test_merge_segments_matches_naive():
+    r = random.Random(0)
+    for _ in range(200):
+        segments = random_book(r)
+        expected = naive_merge(segments, 59)
+        assert repr(merge_segments(segments, 59)) == repr(expected)
+        assert repr(list(iter_merge_segments(iter(segments), 59))) == repr(list(expected.items()))
+
+
+def test_merge_segments_chains_to_nearest_surviving_segment():
+    line = ('x', 'l', 40)
+    segments = [('p0_0', [line, line], True), ('p1_0', [line, line], True), ('p2_0', [line, line], True)]
+    assert merge_segments(segments, 59) == {'p0_0': [line] * 6}
+
+
+def test_merge_segments_keeps_input():
+    segments = random_book(random.Random(1))
+    before = copy.deepcopy(segments)
+    merge_segments(segments, 59)
+    assert repr(segments) == repr(before)
@@ -0,0 +1,61 @@
+from blatt import Page
+from blatt.pack import PackedCorpus, PackWriter, pack
+from blatt.sources import iter_sources
+import numpy as np
+import pytest
+
+
+def assert_same_page(packed, page):
+    assert packed.text_lines == page.text_lines
+    assert list(packed.line_ids) == list(page.line_ids)
+    for name in ('baseline_points', 'baseline_offsets', 'coords_points', 'coords_offsets', 'text_line_index'):
+        np.testing.assert_array_equal(getattr(packed, name), getattr(page, name))
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_pack_round_trip(page_folder, tmp_path, jobs):
+    paths = sorted(page_folder.iterdir())
+    assert pack(iter_sources(page_folder), tmp_path / 'book.pack', jobs) == len(paths)
+    with PackedCorpus(tmp_path / 'book.pack') as corpus:
+        assert corpus.filenames == paths
+        for packed, path in zip(corpus.pages(), paths):
+            assert_same_page(packed, Page(path))
+        assert_same_page(corpus[-1], Page(paths[-1]))
+        with pytest.raises(IndexError):
+            corpus.page(len(paths))
+
+
+def test_pack_writer(page_folder, tmp_path):
+    paths = sorted(page_folder.iterdir())[:2]
+    with PackWriter(tmp_path / 'book.pack') as writer:
+        for path in paths:
+            writer.add(Page(path))
+    with PackedCorpus(tmp_path / 'book.pack') as corpus:
+        assert len(corpus.filenames) == 2
+        assert_same_page(corpus[1], Page(paths[1]))
+    with PackWriter(tmp_path / 'empty.pack'):
+        pass
+    with PackedCorpus(tmp_path / 'empty.pack') as corpus:
+        assert list(corpus.pages()) == []
+
+
+def test_close(page_folder, tmp_path):
+    pack(iter_sources(page_folder), tmp_path / 'book.pack')
+    corpus = PackedCorpus(tmp_path / 'book.pack')
+    page = corpus[0]
+    corpus.close()
+    corpus.close()
+    # the points of a Page in use stay readable after close
+    assert page.baseline_points.sum() > 0
+    with pytest.raises(ValueError):
+        corpus.page(0)
+    with PackedCorpus(tmp_path / 'book.pack') as corpus:
+        pass
+    with pytest.raises(ValueError):
+        corpus.page(0)
+
+
+def test_not_a_pack(tmp_path):
+    (tmp_path / 'book.pack').write_bytes(b'<?xml version="1.0"?>' + b'\0' * 100)
+    with pytest.raises(ValueError, match='not a packed blatt corpus'):
+        PackedCorpus(tmp_path / 'book.pack')
@@ -0,0 +1,190 @@
+from blatt import Page
+from xml.sax.saxutils import escape
+import numpy as np
+import random
+
+NESTED_MISSING_BASELINE = b'''<?xml version="1.0" encoding="UTF-8"?>
+<PcGts xmlns="http://schema.primaresearch.org/PAGE/gts/pagecontent/2019-07-15">
+  <Page imageFilename="nested.jpg" imageWidth="1000" imageHeight="1000">
+    <TextRegion id="r0">
+      <TextLine id="l0">
+        <Coords points="10,10 90,10 90,30 10,30"/><Baseline points="10,30 90,30"/>
+        <TextEquiv><Unicode>Erste Zeile</Unicode></TextEquiv>
+      </TextLine>
+      <TextRegion id="r1">
+        <TextLine id="l1">
+          <Coords points="10,110 90,110 90,130 10,130"/><Baseline points="10,130 90,130"/>
+          <TextEquiv><Unicode>Innere Zeile</Unicode></TextEquiv>
+        </TextLine>
+      </TextRegion>
+      <TextLine id="l2">
+        <Coords points="10,50 90,50 90,70 10,70"/>
+        <TextEquiv><Unicode>Ohne Baseline</Unicode></TextEquiv>
+      </TextLine>
+    </TextRegion>
+    <TextRegion id="r2">
+      <TextLine id="l3">
+        <Coords points="10,210 90,210 90,230 10,230"/>
+        <TextEquiv><Unicode>Auch ohne Baseline</Unicode></TextEquiv>
+      </TextLine>
+    </TextRegion>
+  </Page>
+</PcGts>
+'''
+
+
+def test_streaming_nested_regions_missing_baseline(tmp_path):
+    path = tmp_path / 'nested.xml'
+    path.write_bytes(NESTED_MISSING_BASELINE)
+    tree, streamed = Page(path, streaming=False), Page(path, streaming=True)
+    assert streamed.text_lines == tree.text_lines
+    assert list(streamed.line_ids) == list(tree.line_ids) == ['l0', 'l2', 'l1', 'l3']
+    for name in ('line_region_ids', 'baseline_points', 'baseline_offsets', 'coords_points', 'coords_offsets'):
+        np.testing.assert_array_equal(getattr(streamed, name), getattr(tree, name))
+    # l2 reuses the Baseline of l0, the TextLine before it in its TextRegion, and l3 that of l1
+    points = tree.baseline_points.tolist()
+    assert points[2:4] == points[0:2]
+    assert points[6:8] == points[4:6]
+
+
+def old_remove_hyphens(lines):
+    """remove_hyphens before it was made linear-time."""
+    hyphens = ['-', '-', '⹀', '⸗']
+    text = lines[0]
+    for i, line in enumerate(lines[:-1]):
+        if line:  # only for non-empty strings
+            if line[-1] in hyphens:
+                if lines[i + 1]:
+                    if lines[i + 1][0].isupper():
+                        text += lines[i + 1]
+                    else:
+                        text = text[:-1] + lines[i + 1]
+            else:
+                text += ' ' + lines[i + 1]
+    return text
+
+
+HYPHENATION_CASES = [
+    ['Zeile'],
+    ['Silben-'],
+    ['Silben¬'],
+    [''],
+    ['', ''],
+    ['Silben-', 'trennung'],
+    ['Silben⸗', 'trennung', 'und⹀', 'Namen-', 'Liste'],
+    ['Silben¬', 'trennung'],
+    ['Silben-', '', 'trennung'],
+    ['', 'a-', ''],
+    ['a -', ' b', 'c- ', 'd'],
+    ['a-', '-', '-b', 'c'],
+    ['Ende-', 'Ende-'],
+    ['-', 'x', '', 'y', '-'],
+]
+
+
+def random_lines(r):
+    return [''.join(r.choice(['a', 'B', '-', '⸗', '¬', ' ', 'ß']) for _ in range(r.randint(0, 4)))
+            for _ in range(r.randint(1, 8))]
+
+
+def check_line_offsets(lines, text):
+    offsets = Page.line_offsets(lines)
+    assert offsets.shape == (len(lines), 2)
+    starts, ends = offsets[:, 0], offsets[:, 1]
+    assert (np.diff(starts) >= 0).all() and (np.diff(ends) >= 0).all() and (starts <= ends).all()
+    assert ends.max(initial=0) <= len(text)
+    for line, (start, end) in zip(lines, offsets.tolist()):
+        # a line maps to its text, without a removed hyphen, or to an empty span if it was dropped
+        assert text[start:end] == line[:end - start]
+        assert end - start in (0, len(line), len(line) - 1)
+
+
+def test_remove_hyphens_cases():
+    for lines in HYPHENATION_CASES:
+        text = old_remove_hyphens(lines)
+        assert Page.remove_hyphens(lines) == text
+        assert Page.remove_hyphens(iter(lines)) == text
+        assert ''.join(Page.iter_remove_hyphens(iter(lines))) == text
+        check_line_offsets(lines, text)
+    assert Page.remove_hyphens(['Silben-', 'trennung', 'Silben-', 'Trennung']) == 'Silbentrennung Silben-Trennung'
+    assert Page.remove_hyphens(['Silben¬', 'trennung']) == 'Silben¬ trennung'
+    assert Page.remove_hyphens([]) == ''
+    assert Page.line_offsets([]).shape == (0, 2)
+
+
+def test_remove_hyphens_matches_old_algorithm():
+    r = random.Random(0)
+    for _ in range(5000):
+        lines = random_lines(r)
+        text = old_remove_hyphens(lines)
+        assert Page.remove_hyphens(lines) == text
+        assert ''.join(Page.iter_remove_hyphens(iter(lines))) == text
+        check_line_offsets(lines, text)
+
+
+def test_line_offsets():
+    lines = ['Die Silben-', 'trennung und', 'Namen-', 'Liste']
+    assert Page.remove_hyphens(lines) == 'Die Silbentrennung und Namen-Liste'
+    assert Page.line_offsets(lines).tolist() == [[0, 10], [10, 22], [23, 29], [29, 34]]
+    # as in the old algorithm, the line after an empty line is dropped
+    assert Page.remove_hyphens(['Zeile', '', 'weg']) == 'Zeile '
+    assert Page.line_offsets(['Zeile', '', 'weg']).tolist() == [[0, 5], [6, 6], [6, 6]]
+
+
+def page_from_lines(tmp_path, lines):
+    """A Page with one TextRegion of the given TextLines."""
+    text_lines = ''.join(f'''<TextLine id="l{i}"><Coords points="0,{10 * i} 9,{10 * i}"/>
+        <Baseline points="0,{10 * i} 9,{10 * i}"/><TextEquiv><Unicode>{escape(line)}</Unicode></TextEquiv></TextLine>
+        ''' for i, line in enumerate(lines))
+    path = tmp_path / 'lines.xml'
+    path.write_text(f'''<?xml version="1.0" encoding="UTF-8"?>
+<PcGts xmlns="http://schema.primaresearch.org/PAGE/gts/pagecontent/2019-07-15">
+  <Page imageFilename="lines.jpg" imageWidth="100" imageHeight="100">
+    <TextRegion id="r0">{text_lines}</TextRegion>
+  </Page>
+</PcGts>''', encoding='utf-8')
+    return Page(path)
+
+
+def naive_lines_in_span(offsets, start, end):
+    return [i for i, (a, b) in enumerate(offsets.tolist()) if a < b and a < end and start < b]
+
+
+def test_sentence_spans(page_folder):
+    for path in sorted(page_folder.iterdir()):
+        page = Page(path)
+        text, spans = page.text_without_linebreaks, page.sentence_spans
+        assert spans.shape == (len(page.sentences), 2)
+        assert [text[start:end] for start, end in spans.tolist()] == page.sentences
+        assert (spans[1:, 0] >= spans[:-1, 1]).all()
+        for start, end in spans.tolist():
+            assert page.lines_in_span(start, end).tolist() == naive_lines_in_span(page.text_offsets, start, end)
+
+
+def test_lines_in_span_at_line_boundaries(tmp_path):
+    page = page_from_lines(tmp_path, ['Die Silben-', 'trennung und', 'Namen-', 'Liste.'])
+    assert page.text_without_linebreaks == 'Die Silbentrennung und Namen-Liste.'
+    assert page.text_offsets.tolist() == [[0, 10], [10, 22], [23, 29], [29, 35]]
+    # a span ending at the start of a line does not overlap it, a span starting at the end of a line neither
+    assert page.lines_in_span(0, 10).tolist() == [0]
+    assert page.lines_in_span(10, 22).tolist() == [1]
+    assert page.lines_in_span(22, 23).tolist() == []
+    # across the removed hyphen
+    assert page.lines_in_span(9, 11).tolist() == [0, 1]
+    assert page.lines_in_span(4, 18).tolist() == [0, 1]
+    assert page.lines_in_span(28, 30).tolist() == [2, 3]
+    assert page.lines_in_span(0, 35).tolist() == [0, 1, 2, 3]
+    assert page.lines_in_span(35, 35).tolist() == []
+    assert page.sentence_lines()[0][2] == ['l0', 'l1', 'l2', 'l3']
+
+
+def test_lines_in_span_matches_naive(tmp_path):
+    r = random.Random(0)
+    for _ in range(50):
+        lines = [line.strip() or 'x' for line in random_lines(r)]
+        page = page_from_lines(tmp_path, lines)
+        offsets, length = page.text_offsets, len(page.text_without_linebreaks)
+        np.testing.assert_array_equal(offsets, Page.line_offsets(page.text_lines))
+        for start in range(length + 1):
+            for end in range(start, length + 2):
+                assert page.lines_in_span(start, end).tolist() == naive_lines_in_span(offsets, start, end)
@@ -0,0 +1,40 @@
+from blatt.parallel import WorkerError, clamp_jobs, imap, worker_errors
+import concurrent.futures
+import pickle
+import pytest
+
+
+def square(x):
+    return x * x
+
+
+def fail(x):
+    with worker_errors(f'item{x}'):
+        raise ValueError('bad')
+
+
+def test_imap():
+    assert list(imap(square, range(20), jobs=3, window=2)) == [x * x for x in range(20)]
+    assert list(imap(square, iter([]), jobs=3)) == []
+
+
+def test_imap_single_item_without_pool(monkeypatch):
+    def no_pool(*args, **kwargs):
+        raise AssertionError('pool started')
+
+    monkeypatch.setattr(concurrent.futures, 'ProcessPoolExecutor', no_pool)
+    assert list(imap(square, iter([3]), jobs=8)) == [9]
+    assert list(imap(square, range(5), jobs=1)) == [0, 1, 4, 9, 16]
+
+
+def test_clamp_jobs():
+    assert clamp_jobs(8, None) == 8
+    assert clamp_jobs(8, 3) == 3
+    assert clamp_jobs(8, 0) == 1
+
+
+def test_worker_errors():
+    with pytest.raises(WorkerError, match='item1: bad'):
+        list(imap(fail, [1, 2], jobs=2))
+    error = pickle.loads(pickle.dumps(WorkerError('x.xml: bad')))
+    assert str(error) == 'x.xml: bad'
@@ -0,0 +1,66 @@
+from blatt.rules import KeyValueRules
+from pathlib import Path
+import pytest
+
+PROJECTS = Path(__file__).parent.parent / 'projects'
+
+
+@pytest.fixture
+def rules():
+    return KeyValueRules(exceptions=['', 'Nürnberg'], excluded=['stellv.'], not_first=['Inhaber'],
+                         replacements={'::': ':'}, reference=r'\b(?:siehe|siche) ', reference_key='siehe',
+                         unmatched_key='OHNE_siehe')
+
+
+def test_extract(rules):
+    lines = ['Firma X, Berlin.', 'Fernruf: 12 34', '56.', 'Inhaber: Y.']
+    assert rules.extract(lines) == ('Firma X, Berlin.', [('Fernruf', '12 34 56.'), ('Inhaber', 'Y.')])
+
+
+def test_key_before_first_colon(rules):
+    # the key is the text before the first ':', also without a following space
+    assert rules.extract(['X', 'Zweck:Handel: Eisen']) == ('X', [('Zweck', 'Handel: Eisen')])
+
+
+def test_no_trailing_space(rules):
+    assert rules.extract(['X', 'Kapital: ']) == ('X', [('Kapital', '')])
+    assert rules.extract(['X', 'Kapital: 1 Mill.']) == ('X', [('Kapital', '1 Mill.')])
+
+
+def test_not_first(rules):
+    assert rules.extract(['Inhaber: Y.', 'Fernruf: 1']) == ('Inhaber: Y.', [('Fernruf', '1')])
+    assert rules.extract(['X', 'Fernruf: 1', 'Inhaber: Y.']) == ('X', [('Fernruf', '1'), ('Inhaber', 'Y.')])
+
+
+def test_keys_that_are_no_keys(rules):
+    # exceptions match the whole key, excluded substrings ignore the case
+    lines = ['X', 'Vorstand: A', 'B (Stellv.: C)', 'Nürnberg: E', 'Konto 12: F', 'Werk Nürnberg: D']
+    assert rules.extract(lines) == ('X', [('Vorstand', 'A B (Stellv.: C) Nürnberg: E Konto 12: F'),
+                                          ('Werk Nürnberg', 'D')])
+    assert KeyValueRules(allow_digits=True).extract(['X', 'Konto 12: F']) == ('X', [('Konto 12', 'F')])
+
+
+def test_replacements(rules):
+    assert rules.extract(['X', 'Fernruf:: 1']) == ('X', [('Fernruf', '1')])
+
+
+def test_reference(rules):
+    lines = ['Firma X', 'siche Firma', 'Y, Berlin']
+    assert rules.extract(lines) == ('Firma X', [('siehe', 'Firma Y, Berlin')])
+
+
+def test_unmatched(rules):
+    assert rules.extract(['Firma X', 'Berlin']) == ('Firma X Berlin', [('OHNE_siehe', 'Firma X Berlin')])
+    assert KeyValueRules().extract(['Firma X', 'Berlin']) == ('Firma X Berlin', [])
+
+
+def test_empty_segment():
+    assert KeyValueRules().extract([]) == ('', [])
+    assert KeyValueRules().extract(['', '']) == ('', [])
+
+
+@pytest.mark.parametrize('book', ['MI1937', 'WL1940'])
+def test_project_rules(book):
+    rules = KeyValueRules.load(PROJECTS / book / 'rules.json')
+    lines = ['Firma X', 'Inhaber: Y', 'Fernruf: 1', 'Vorstand: Z (stellv.: W)']
+    assert rules.extract(lines) == ('Firma X Inhaber: Y', [('Fernruf', '1'), ('Vorstand', 'Z (stellv.: W)')])
@@ -0,0 +1,30 @@
+from blatt.sentences import RuleSplitter, SentenceSplitter, get_splitter
+import pytest
+
+
+class IncompleteSplitter(SentenceSplitter):
+    name = 'incomplete'
+
+
+class LineSplitter(SentenceSplitter):
+    name = 'lines'
+
+    def split(self, text):
+        return text.split('\n')
+
+
+def test_abstract_split():
+    with pytest.raises(TypeError):
+        SentenceSplitter()
+    with pytest.raises(TypeError):
+        IncompleteSplitter()
+    splitter = LineSplitter()
+    assert get_splitter(splitter) is splitter
+    assert splitter.split_batch(['a\nb', 'c']) == [['a', 'b'], ['c']]
+
+
+def test_split_batch():
+    texts = [f'Firma {i}, Berlin. Fernruf: {i}.' for i in range(100)]
+    splitter = get_splitter('rules')
+    assert isinstance(splitter, RuleSplitter)
+    assert splitter.split_batch(texts, jobs=2, batch_size=8) == [splitter.split(text) for text in texts]
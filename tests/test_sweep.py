@@ -0,0 +1,72 @@
+from blatt import Page
+from blatt.cli import cli
+from blatt.layout import merge_segments, page_layout
+from blatt.sources import iter_sources
+from blatt.sweep import book_gaps, load_gaps, save_gaps, suggest_thresholds, sweep
+from click.testing import CliRunner
+import numpy as np
+import pytest
+
+
+def reference_counts(pages, min_dy, max_dy):
+    """Segments and entries of the book with page_layout and merge_segments."""
+    segments = []
+    for p, page in enumerate(pages):
+        layout = page_layout(page, 2, min_dy=min_dy)
+        order, dy0 = layout['order'].tolist(), layout['dy0'].tolist()
+        for s, (start, stop) in enumerate(zip(layout['segments']['start'].tolist(),
+                                              layout['segments']['stop'].tolist())):
+            lines = [(page.text_lines[order[k]], page.line_ids[order[k]], dy0[k]) for k in range(start, stop)]
+            segments.append(((p, s), lines, s == 0))
+    return len(segments), len(merge_segments(segments, max_dy))
+
+
+def test_sweep_matches_merge_segments(page_folder):
+    pages = [Page(path, streaming=True) for path in sorted(page_folder.iterdir())]
+    min_dys, max_dys = [40, 43, 45, 60, 86, 100], [30, 42, 44, 46, 59, 95]
+    rows = sweep(book_gaps(iter_sources(page_folder)), min_dys, max_dys)
+    assert len(rows) == len(min_dys) * len(max_dys)
+    for row in rows:
+        segments, entries = reference_counts(pages, row['min_dy'], row['max_dy'])
+        assert (row['segments'], row['entries']) == (segments, entries)
+        assert row['merged'] == segments - entries
+
+
+def test_book_gaps_jobs(page_folder, tmp_path):
+    gaps = book_gaps(iter_sources(page_folder))
+    assert gaps['page_offsets'][-1] == len(gaps['dy0']) == len(gaps['colon'])
+    parallel = book_gaps(iter_sources(page_folder), jobs=2)
+    save_gaps(parallel, tmp_path / 'gaps.npz')
+    loaded = load_gaps(tmp_path / 'gaps.npz')
+    for name in gaps:
+        np.testing.assert_array_equal(loaded[name], gaps[name])
+
+
+def test_suggest_thresholds():
+    r = np.random.default_rng(0)
+    dy0 = np.concatenate([r.normal(44, 2, 900), r.normal(120, 5, 100), [np.nan, -800]])
+    suggested = suggest_thresholds({'dy0': dy0})
+    assert 55 < suggested['min_dy'] < 100
+    assert 44 < suggested['max_dy'] < 55
+    assert abs(suggested['line_spacing'] - 44) < 1
+    with pytest.raises(ValueError):
+        suggest_thresholds({'dy0': np.array([np.nan, -5.0])})
+
+
+def test_cli(page_folder, tmp_path):
+    runner = CliRunner()
+    cache = tmp_path / 'gaps.npz'
+    result = runner.invoke(cli, ['sweep', str(page_folder), '--min-dy', '40:60:10', '--max-dy', '59,95', '--cache',
+                                 str(cache)])
+    assert result.exit_code == 0, result.output
+    assert cache.exists()
+    lines = result.stdout.splitlines()
+    assert lines[0] == 'min_dy\tmax_dy\tsegments\tmerged\tentries'
+    assert [line.split('\t')[:2] for line in lines[1:]] == [[a, b] for a in ('40', '50', '60') for b in ('59', '95')]
+    assert 'Suggested thresholds: min_dy=' in result.stderr
+    cached = runner.invoke(cli, ['sweep', str(page_folder), '--min-dy', '40:60:10', '--max-dy', '59,95', '--cache',
+                                 str(cache)])
+    assert cached.stdout == result.stdout
+    result = runner.invoke(cli, ['sweep', str(page_folder), '--min-dy', '60:40:10'])
+    assert result.exit_code == 2
+    assert 'neither start:stop:step' in result.output